@@ -2,34 +2,95 @@
 Configuration settings for the Voice-Enabled AI Agent System
 """
 import os
-from typing import Optional
-from pydantic import Field
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Optional
+from pydantic import Field, PrivateAttr
 from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-load_dotenv()
+ENV_FILE = ".env"
+
+class LazyMapping(Mapping):
+    """Read-only mapping that resolves each value on first access"""
+    
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self._loaders = loaders
+        self._values: Dict[str, Any] = {}
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._values:
+            self._values[key] = self._loaders[key]()
+        return self._values[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders)
+    
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+@lru_cache(maxsize=1)
+def _env_file_values() -> Dict[str, Optional[str]]:
+    """Parse the .env file once, on the first lazy lookup"""
+    return {key.upper(): value for key, value in dotenv_values(ENV_FILE).items()}
+
+def _env_loader(name: str, default: Optional[str] = None) -> Callable[[], Optional[str]]:
+    """Build a loader reading a value from the environment, then the .env file"""
+    env_name = name.upper()
+    
+    def load() -> Optional[str]:
+        value = os.environ.get(env_name)
+        if value is None:
+            value = _env_file_values().get(env_name)
+        return value if value is not None else default
+    
+    return load
 
 class Settings(BaseSettings):
     """Application settings"""
     
+    # Secrets are resolved on first access rather than at startup, so
+    # processes that never use a secret never fetch it
+    _lazy: LazyMapping = PrivateAttr(default_factory=lambda: LazyMapping({
+        "openai_api_key": _env_loader("openai_api_key", ""),
+        "weather_api_key": _env_loader("weather_api_key", ""),
+        "api_key": _env_loader("api_key"),
+    }))
+    
     # OpenAI Configuration
-    openai_api_key: str = Field(default=os.getenv("OPENAI_API_KEY", ""))
     openai_model: str = Field(default="gpt-4")
     openai_embedding_model: str = Field(default="text-embedding-3-small")
     
     # Weather API Configuration
-    weather_api_key: str = Field(default=os.getenv("WEATHER_API_KEY", ""))
     weather_api_url: str = Field(default="http://api.weatherapi.com/v1")
     
     # Vector Store Configuration
     vector_store_path: str = Field(default="vector_stores")
     chunk_size: int = Field(default=1000)
     chunk_overlap: int = Field(default=200)
+    hnsw_m: int = Field(default=16)
+    hnsw_ef_construction: int = Field(default=64)
+    hnsw_ef_search: int = Field(default=64)
+    retrieval_similarity_threshold: float = Field(default=0.3)
+    quantize_int8: bool = Field(default=False)
+    quantize_fp16: bool = Field(default=False)
+    quantize_min_vectors: int = Field(default=1000)
+    pq_min_vectors: int = Field(default=50000)
+    ivf_nlist: int = Field(default=1024)
+    ivf_nprobe: int = Field(default=16)
+    pq_m: int = Field(default=64)
+    pq_nbits: int = Field(default=8)
+    embedding_cache_path: str = Field(default="vector_stores/embedding_cache.sqlite3")
     
     # Agent Configuration
     max_iterations: int = Field(default=5)
+    agent_verbose: bool = Field(default=False)
     temperature: float = Field(default=0.7)
     max_tokens: int = Field(default=2000)
+    history_token_budget: int = Field(default=3000)
+    context_token_budget: int = Field(default=800)
+    route_classifier_threshold: float = Field(default=0.6)
     
     # Audio Configuration
     audio_sample_rate: int = Field(default=16000)
@@ -43,17 +104,49 @@ class Settings(BaseSettings):
     max_concurrent_requests: int = Field(default=10)
     request_timeout: int = Field(default=60)
     cache_ttl: int = Field(default=3600)
+    max_sessions: int = Field(default=1000)
+    tts_cache_max_entries: int = Field(default=1024)
+    weather_cache_max_entries: int = Field(default=256)
+    weather_cache_ttl: int = Field(default=300)
+    forecast_cache_ttl: int = Field(default=1800)
+    tool_breaker_fail_max: int = Field(default=5)
+    tool_breaker_reset_timeout: int = Field(default=30)
+    routing_cache_max_entries: int = Field(default=1000)
+    routing_cache_similarity_threshold: float = Field(default=0.8)
+    retrieval_cache_max_entries: int = Field(default=4096)
+    retrieval_cache_similarity_threshold: float = Field(default=0.97)
+    context_cache_max_entries: int = Field(default=4096)
+    context_cache_ttl: int = Field(default=300)
+    query_embedding_cache_size: int = Field(default=1024)
     
     # Security Configuration
     enable_api_key: bool = Field(default=False)
-    api_key: Optional[str] = Field(default=None)
     
     class Config:
-        env_file = ".env"
+        env_file = ENV_FILE
         env_file_encoding = "utf-8"
+        # Lazy secrets live in the same .env file but are not fields
+        extra = "ignore"
+    
+    @property
+    def openai_api_key(self) -> str:
+        return self._lazy["openai_api_key"]
+    
+    @property
+    def weather_api_key(self) -> str:
+        return self._lazy["weather_api_key"]
+    
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._lazy["api_key"]
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the process-wide settings instance, reading the environment once"""
+    return Settings()
 
 # Create settings instance
-settings = Settings()
+settings = get_settings()
 
 # Agent-specific configurations
 AGENT_CONFIGS = {
@@ -161,3 +254,9 @@ ORCHESTRATOR_CONFIG = {
     - When in doubt, use 'general' agent
     """
 }
+
+# Immutable lookups derived from AGENT_CONFIGS, built once at import
+AGENT_NAMES = frozenset(AGENT_CONFIGS)
+AGENT_TOOLS = MappingProxyType({
+    name: frozenset(config["tools"]) for name, config in AGENT_CONFIGS.items()
+})
@@ -3,19 +3,20 @@ Audio Router - Handles speech-to-text and text-to-speech operations
 """
 import os
 import base64
-import time
+import hashlib
 import logging
 from typing import Dict, Any
 from pathlib import Path
 
-from fastapi import APIRouter, File, UploadFile, Request, HTTPException, Form
+from cachetools import TTLCache
+from fastapi import APIRouter, File, UploadFile, Request, HTTPException, Form, Query
+from fastapi.responses import Response
 from pydantic import BaseModel
 import openai
-from dotenv import load_dotenv
 
-from app.services.metrics_logger import MetricsLogger
-
-load_dotenv()
+from app.services.metrics_logger import MetricsLogger, Timer
+from app.services.response_cache import CachedJSONResponse
+from app.config import get_settings, settings
 
 # Initialize router
 audio_router = APIRouter(prefix="/api/audio", tags=["audio"])
@@ -25,12 +26,56 @@ logger = logging.getLogger(__name__)
 metrics_logger = MetricsLogger()
 
 # Initialize OpenAI client
-api_key = os.getenv("OPENAI_API_KEY")
+api_key = get_settings().openai_api_key
 if not api_key:
     logger.error("OPENAI_API_KEY environment variable not set")
     raise ValueError("OPENAI_API_KEY environment variable not set")
 
-client = openai.OpenAI(api_key=api_key)
+client = openai.AsyncOpenAI(api_key=api_key)
+
+# Supported upload formats and TTS voices
+ALLOWED_AUDIO_EXTS = frozenset({'.mp3', '.mp4', '.mpeg', '.mpga', '.m4a', '.wav', '.webm'})
+AVAILABLE_VOICES = frozenset({"alloy", "echo", "fable", "onyx", "nova", "shimmer"})
+
+# Static voice list, serialized once
+VOICES_RESPONSE = CachedJSONResponse({
+    "voices": [
+        {"id": "alloy", "name": "Alloy", "gender": "neutral", "description": "Neutral and balanced"},
+        {"id": "echo", "name": "Echo", "gender": "male", "description": "Smooth and articulate"},
+        {"id": "fable", "name": "Fable", "gender": "neutral", "description": "Expressive and dynamic"},
+        {"id": "onyx", "name": "Onyx", "gender": "male", "description": "Deep and authoritative"},
+        {"id": "nova", "name": "Nova", "gender": "female", "description": "Warm and friendly"},
+        {"id": "shimmer", "name": "Shimmer", "gender": "female", "description": "Clear and vibrant"}
+    ],
+    "default": "alloy"
+})
+
+# Generated speech (raw audio and metrics) keyed by text hash, voice and speed
+tts_cache: TTLCache = TTLCache(maxsize=settings.tts_cache_max_entries, ttl=settings.cache_ttl)
+
+def _tts_cache_key(text: str, voice: str, speed: float) -> str:
+    """Build the TTS cache key for a text, voice and speed"""
+    text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{text_hash}:{voice}:{speed:.2f}"
+
+def _tts_response(speech: Dict[str, Any], response_format: str):
+    """Render generated speech as raw MP3 bytes or a base64 JSON payload"""
+    if response_format == "binary":
+        return Response(
+            content=speech["audio_content"],
+            media_type="audio/mpeg",
+            headers={
+                "X-Duration-Ms": str(speech["duration_ms"]),
+                "X-Size-Kb": str(speech["size_kb"])
+            }
+        )
+    
+    return {
+        "audio": base64.b64encode(speech["audio_content"]).decode('utf-8'),
+        "format": "mp3",
+        "duration_ms": speech["duration_ms"],
+        "size_kb": speech["size_kb"]
+    }
 
 class TTSRequest(BaseModel):
     """Text-to-speech request model"""
@@ -55,46 +100,32 @@ async def transcribe_audio(audio_file: UploadFile = File(...)):
     Returns:
         Transcribed text with metrics
     """
-    start_time = time.time()
-    temp_file_path = None
-    
     try:
         # Validate file type
-        allowed_formats = ['.mp3', '.mp4', '.mpeg', '.mpga', '.m4a', '.wav', '.webm']
-        file_ext = Path(audio_file.filename).suffix.lower()
+        file_ext = Path(audio_file.filename).suffix.lower() if audio_file.filename else ""
         
-        if file_ext not in allowed_formats:
+        if file_ext not in ALLOWED_AUDIO_EXTS:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Unsupported audio format. Allowed formats: {', '.join(allowed_formats)}"
+                detail=f"Unsupported audio format. Allowed formats: {', '.join(sorted(ALLOWED_AUDIO_EXTS))}"
             )
         
-        # Read file content
-        contents = await audio_file.read()
-        
-        # Log file size
-        file_size_mb = len(contents) / (1024 * 1024)
+        # Measure upload size without reading it into memory
+        audio_file.file.seek(0, os.SEEK_END)
+        file_size_mb = audio_file.file.tell() / (1024 * 1024)
+        audio_file.file.seek(0)
         logger.info(f"Processing audio file: {audio_file.filename} ({file_size_mb:.2f} MB)")
         
-        # Save to temporary file
-        temp_file_path = f"temp/temp_{int(time.time())}_{audio_file.filename}"
-        Path("temp").mkdir(exist_ok=True)
-        
-        with open(temp_file_path, "wb") as f:
-            f.write(contents)
-        
-        # Transcribe with Whisper
-        stt_start = time.time()
-        with open(temp_file_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
+        # Transcribe with Whisper straight from the spooled upload
+        with Timer() as stt_timer:
+            transcript = await client.audio.transcriptions.create(
                 model="whisper-1",
-                file=f,
+                file=(audio_file.filename, audio_file.file),
                 response_format="text"
             )
-        stt_duration = (time.time() - stt_start) * 1000
+        stt_duration = stt_timer.elapsed_ms
         
         # Log metrics
-        total_duration = (time.time() - start_time) * 1000
         metrics_logger.log_stt_metrics(
             duration_ms=stt_duration,
             file_size_mb=file_size_mb,
@@ -115,27 +146,22 @@ async def transcribe_audio(audio_file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Unexpected error during transcription: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {str(e)}")
 
 @audio_router.post("/tts")
-async def text_to_speech(request: TTSRequest):
+async def text_to_speech(
+    request: TTSRequest,
+    response_format: str = Query(default="json", alias="format")
+):
     """
     Convert text to speech using OpenAI TTS
     
     Args:
         request: TTS request with text and voice settings
+        response_format: "json" for base64 audio with metrics, "binary" for raw MP3
         
     Returns:
-        Base64 encoded audio data with metrics
+        Base64 encoded audio data with metrics, or the raw MP3 bytes
     """
-    start_time = time.time()
-    
     try:
         # Validate input
         if not request.text:
@@ -144,26 +170,28 @@ async def text_to_speech(request: TTSRequest):
         if len(request.text) > 4096:
             raise HTTPException(status_code=400, detail="Text too long (max 4096 characters)")
         
-        # Available voices
-        available_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
-        if request.voice not in available_voices:
+        if request.voice not in AVAILABLE_VOICES:
             request.voice = "alloy"
         
+        cache_key = _tts_cache_key(request.text, request.voice, request.speed)
+        cached = tts_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"TTS cache hit for {len(request.text)} characters with voice: {request.voice}")
+            return _tts_response(cached, response_format)
+        
         logger.info(f"Generating speech for {len(request.text)} characters with voice: {request.voice}")
         
         # Generate speech
-        tts_start = time.time()
-        response = client.audio.speech.create(
-            model="tts-1",
-            input=request.text,
-            voice=request.voice,
-            speed=request.speed
-        )
-        tts_duration = (time.time() - tts_start) * 1000
+        with Timer() as tts_timer:
+            response = await client.audio.speech.create(
+                model="tts-1",
+                input=request.text,
+                voice=request.voice,
+                speed=request.speed
+            )
+        tts_duration = tts_timer.elapsed_ms
         
-        # Convert to base64
         audio_content = response.content
-        audio_base64 = base64.b64encode(audio_content).decode('utf-8')
         
         # Calculate audio size
         audio_size_kb = len(audio_content) / 1024
@@ -177,12 +205,14 @@ async def text_to_speech(request: TTSRequest):
         
         logger.info(f"Speech generation completed in {tts_duration:.2f}ms, size: {audio_size_kb:.2f}KB")
         
-        return {
-            "audio": audio_base64,
-            "format": "mp3",
+        speech = {
+            "audio_content": audio_content,
             "duration_ms": tts_duration,
             "size_kb": audio_size_kb
         }
+        tts_cache[cache_key] = speech
+        
+        return _tts_response(speech, response_format)
         
     except openai.APIError as e:
         logger.error(f"OpenAI API error: {str(e)}")
@@ -192,19 +222,9 @@ async def text_to_speech(request: TTSRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @audio_router.get("/voices")
-async def get_available_voices():
+async def get_available_voices(request: Request):
     """Get list of available TTS voices"""
-    return {
-        "voices": [
-            {"id": "alloy", "name": "Alloy", "gender": "neutral", "description": "Neutral and balanced"},
-            {"id": "echo", "name": "Echo", "gender": "male", "description": "Smooth and articulate"},
-            {"id": "fable", "name": "Fable", "gender": "neutral", "description": "Expressive and dynamic"},
-            {"id": "onyx", "name": "Onyx", "gender": "male", "description": "Deep and authoritative"},
-            {"id": "nova", "name": "Nova", "gender": "female", "description": "Warm and friendly"},
-            {"id": "shimmer", "name": "Shimmer", "gender": "female", "description": "Clear and vibrant"}
-        ],
-        "default": "alloy"
-    }
+    return VOICES_RESPONSE.respond(request)
 
 @audio_router.get("/metrics")
 async def get_audio_metrics():
@@ -1,12 +1,12 @@
 """
 Chat Router - Handles chat interactions and agent orchestration
 """
-import time
 import logging
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
@@ -14,9 +14,12 @@ from langchain.memory import ConversationBufferMemory
 from langchain.schema import HumanMessage, SystemMessage
 
 from app.services.orchestrator import OrchestratorAgent
+from app.services.routing_cache import RoutingCache
 from app.services.specialized_agents import SpecializedAgentFactory
-from app.services.metrics_logger import MetricsLogger
-from app.config import settings
+from app.services.chat_history import TokenCountedChatHistory
+from app.services.metrics_logger import MetricsLogger, Timer
+from app.services.response_cache import CachedJSONResponse
+from app.config import settings, AGENT_NAMES
 
 # Initialize router
 chat_router = APIRouter(prefix="/api/chat", tags=["chat"])
@@ -27,10 +30,24 @@ metrics_logger = MetricsLogger()
 
 # Initialize orchestrator and agents
 orchestrator = OrchestratorAgent()
+routing_cache = RoutingCache(orchestrator)
 agent_factory = SpecializedAgentFactory()
 
-# Session storage 
-sessions: Dict[str, Dict[str, Any]] = {}
+# Static agent list, serialized once
+AGENTS_RESPONSE = CachedJSONResponse({
+    "agents": agent_factory.get_available_agents(),
+    "orchestrator": {
+        "name": "orchestrator",
+        "description": "Automatically routes queries to the best agent"
+    }
+}, max_age=settings.cache_ttl)
+
+# Session storage, bounded and expired after cache_ttl seconds of inactivity
+sessions: TTLCache = TTLCache(maxsize=settings.max_sessions, ttl=settings.cache_ttl)
+
+def now_iso() -> str:
+    """Current UTC time as an ISO 8601 string with millisecond precision"""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
 
 class ChatRequest(BaseModel):
     """Chat request model"""
@@ -66,61 +83,71 @@ async def send_message(request: ChatRequest):
     Returns:
         Agent response with sources and metrics
     """
-    start_time = time.time()
+    request_timer = Timer()
+    timestamp = now_iso()
+    
+    if request.agent_override and request.agent_override not in AGENT_NAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown agent: {request.agent_override}")
     
     try:
         # Create or retrieve session
-        session_id = request.session_id or str(uuid.uuid4())
+        session_id = request.session_id or uuid.uuid4().hex
         
-        if session_id not in sessions:
-            sessions[session_id] = {
-                "memory": ConversationBufferMemory(return_messages=True),
-                "created_at": datetime.now().isoformat(),
+        session = sessions.get(session_id)
+        if session is None:
+            sessions.expire()
+            session = {
+                "memory": ConversationBufferMemory(
+                    chat_memory=TokenCountedChatHistory(),
+                    return_messages=True
+                ),
+                "created_at": timestamp,
                 "message_count": 0,
-                "agents_used": []
+                "agents_used": set()
             }
         
-        session = sessions[session_id]
+        # Re-insert to refresh the session's expiry
+        sessions[session_id] = session
         session["message_count"] += 1
         
-        logger.info(f"Processing message for session {session_id}: {request.message[:100]}...")
+        logger.info("Processing message for session %s: %.100s...", session_id, request.message)
         
         # Determine which agent to use
         if request.agent_override:
             # Use specified agent
             selected_agent = request.agent_override
-            logger.info(f"Using override agent: {selected_agent}")
+            routing_time = 0
+            logger.info("Using override agent: %s", selected_agent)
         else:
             # Use orchestrator to determine best agent
-            routing_start = time.time()
-            selected_agent = await orchestrator.route_query(request.message)
-            routing_time = (time.time() - routing_start) * 1000
-            logger.info(f"Orchestrator selected agent: {selected_agent} (routing took {routing_time:.2f}ms)")
+            with Timer() as routing_timer:
+                selected_agent = await routing_cache.route_query(request.message)
+            routing_time = routing_timer.elapsed_ms
+            logger.info("Orchestrator selected agent: %s (routing took %.2fms)", selected_agent, routing_time)
         
         # Track agent usage
-        if selected_agent not in session["agents_used"]:
-            session["agents_used"].append(selected_agent)
+        session["agents_used"].add(selected_agent)
         
         # Get specialized agent
         agent = agent_factory.get_agent(selected_agent)
         
         # Process query with agent
-        agent_start = time.time()
-        result = await agent.process_query(
-            query=request.message,
-            memory=session["memory"],
-            include_sources=request.include_sources
-        )
-        agent_time = (time.time() - agent_start) * 1000
+        with Timer() as agent_timer:
+            result = await agent.process_query(
+                query=request.message,
+                memory=session["memory"],
+                include_sources=request.include_sources
+            )
+        agent_time = agent_timer.elapsed_ms
         
         # Calculate total processing time
-        total_time = (time.time() - start_time) * 1000
+        total_time = request_timer.elapsed_ms
         
         # Log metrics
         metrics = {
             "total_time_ms": total_time,
             "agent_time_ms": agent_time,
-            "routing_time_ms": routing_time if not request.agent_override else 0,
+            "routing_time_ms": routing_time,
             "tokens_used": result.get("tokens_used", 0),
             "sources_count": len(result.get("sources", [])) if request.include_sources else 0
         }
@@ -132,7 +159,7 @@ async def send_message(request: ChatRequest):
             tokens_used=metrics["tokens_used"]
         )
         
-        logger.info(f"Message processed successfully in {total_time:.2f}ms")
+        logger.info("Message processed successfully in %.2fms", total_time)
         
         return ChatResponse(
             response=result["response"],
@@ -140,7 +167,7 @@ async def send_message(request: ChatRequest):
             agent_used=selected_agent,
             sources=result.get("sources") if request.include_sources else None,
             metrics=metrics,
-            timestamp=datetime.now().isoformat()
+            timestamp=timestamp
         )
         
     except Exception as e:
@@ -169,17 +196,33 @@ async def clear_session(session_id: str):
         logger.error(f"Error clearing session: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to clear session: {str(e)}")
 
+@chat_router.post("/clear-cache")
+async def clear_cache():
+    """
+    Clear cached routing decisions
+    
+    Returns:
+        Success status with cache statistics before clearing
+    """
+    try:
+        stats = routing_cache.get_stats()
+        routing_cache.clear()
+        return {"status": "success", "message": "Routing cache cleared", "stats": stats}
+    except Exception as e:
+        logger.error(f"Error clearing routing cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to clear routing cache: {str(e)}")
+
 @chat_router.get("/sessions", response_model=List[SessionInfo])
 async def get_sessions():
     """Get list of active sessions"""
     try:
         session_list = []
-        for session_id, session_data in sessions.items():
+        for session_id, session_data in list(sessions.items()):
             session_list.append(SessionInfo(
                 session_id=session_id,
                 created_at=session_data["created_at"],
                 message_count=session_data["message_count"],
-                agents_used=session_data["agents_used"]
+                agents_used=sorted(session_data["agents_used"])
             ))
         return session_list
     except Exception as e:
@@ -187,20 +230,9 @@ async def get_sessions():
         raise HTTPException(status_code=500, detail=f"Failed to retrieve sessions: {str(e)}")
 
 @chat_router.get("/agents")
-async def get_available_agents():
+async def get_available_agents(request: Request):
     """Get list of available specialized agents"""
-    try:
-        agents = agent_factory.get_available_agents()
-        return {
-            "agents": agents,
-            "orchestrator": {
-                "name": "orchestrator",
-                "description": "Automatically routes queries to the best agent"
-            }
-        }
-    except Exception as e:
-        logger.error(f"Error retrieving agents: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve agents: {str(e)}")
+    return AGENTS_RESPONSE.respond(request)
 
 @chat_router.post("/feedback")
 async def submit_feedback(
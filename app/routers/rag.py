@@ -2,17 +2,24 @@
 RAG Router - Handles document upload, indexing, and retrieval
 """
 import os
-import time
+import asyncio
 import logging
-from typing import List, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueListener
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
+import aiofiles
 from fastapi import APIRouter, File, UploadFile, HTTPException, Form
 from pydantic import BaseModel
 
-from app.services.document_loader import DocumentLoader
-from app.services.vector_store import VectorStoreService
-from app.services.metrics_logger import MetricsLogger
+from app.services.document_loader import (
+    DocumentLoader, IGNORED_FILE_PREFIXES, init_worker_logging, load_document_chunks, should_index
+)
+from app.services.vector_store import get_vector_store_service
+from app.services.retrieval_cache import RetrievalCache
+from app.services.metrics_logger import MetricsLogger, Timer
 from app.config import settings
 
 # Initialize router
@@ -21,9 +28,36 @@ rag_router = APIRouter(prefix="/api/rag", tags=["rag"])
 # Initialize services
 logger = logging.getLogger(__name__)
 document_loader = DocumentLoader()
-vector_store_service = VectorStoreService()
+vector_store_service = get_vector_store_service()
+retrieval_cache = RetrievalCache(vector_store_service)
 metrics_logger = MetricsLogger()
 
+class _LogForwarder(logging.Handler):
+    """Re-emits records from worker processes through this process's loggers"""
+    
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+# CPU-bound document parsing runs in worker processes, off the event loop. Workers are
+# spawned rather than forked, since forking a process that already runs threads can copy
+# locks mid-use; their log records come back through worker_log_queue
+_mp_context = multiprocessing.get_context("spawn")
+worker_log_queue = _mp_context.Queue()
+worker_log_listener = QueueListener(worker_log_queue, _LogForwarder())
+worker_log_listener.start()
+document_pool = ProcessPoolExecutor(
+    max_workers=os.cpu_count(),
+    mp_context=_mp_context,
+    initializer=init_worker_logging,
+    initargs=(worker_log_queue,)
+)
+
+# Supported document upload formats
+ALLOWED_DOCUMENT_EXTS = frozenset({'.pdf', '.txt', '.docx', '.md', '.csv'})
+
+# Agent document listings keyed by agent, valid while the directory mtime matches
+_listing_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
 class DocumentUploadResponse(BaseModel):
     """Document upload response model"""
     filename: str
@@ -37,7 +71,8 @@ class RetrievalRequest(BaseModel):
     query: str
     agent: str
     top_k: int = 5
-    similarity_threshold: float = 0.7
+    similarity_threshold: Optional[float] = None
+    ef_search: Optional[int] = None
 
 class RetrievalResponse(BaseModel):
     """Document retrieval response model"""
@@ -62,7 +97,7 @@ async def upload_document(
     Returns:
         Upload status and processing metrics
     """
-    start_time = time.time()
+    request_timer = Timer()
     temp_file_path = None
     
     try:
@@ -75,38 +110,46 @@ async def upload_document(
             )
         
         # Validate file type
-        allowed_extensions = ['.pdf', '.txt', '.docx', '.md', '.csv']
-        file_ext = Path(file.filename).suffix.lower()
+        file_ext = Path(file.filename).suffix.lower() if file.filename else ""
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_DOCUMENT_EXTS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
+                detail=f"Unsupported file type. Allowed: {', '.join(sorted(ALLOWED_DOCUMENT_EXTS))}"
             )
         
+        if file.filename.startswith(IGNORED_FILE_PREFIXES):
+            raise HTTPException(status_code=400, detail="Hidden and temporary files cannot be uploaded")
+        
         # Create agent directory if it doesn't exist
         agent_dir = Path(f"dataset/{agent}")
         agent_dir.mkdir(parents=True, exist_ok=True)
         
         # Save uploaded file
         file_path = agent_dir / file.filename
-        content = await file.read()
+        file_size = 0
         
-        with open(file_path, "wb") as f:
-            f.write(content)
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(1 << 20):
+                await f.write(chunk)
+                file_size += len(chunk)
         
+        # Overwriting an existing file leaves the directory mtime unchanged
+        _listing_cache.pop(agent, None)
         logger.info(f"Saved document {file.filename} for agent {agent}")
         
         # Process document
-        processing_start = time.time()
-        documents = document_loader.load_single_document(str(file_path))
-        
-        # Create/update vector store
-        chunks_created = vector_store_service.add_documents(agent, documents)
-        processing_time = (time.time() - processing_start) * 1000
+        loop = asyncio.get_running_loop()
+        with Timer() as processing_timer:
+            documents = await loop.run_in_executor(document_pool, load_document_chunks, str(file_path))
+            
+            # Create/update vector store
+            chunks_created = await asyncio.to_thread(vector_store_service.add_documents, agent, documents)
+            retrieval_cache.invalidate(agent)
+        processing_time = processing_timer.elapsed_ms
         
         # Log metrics
-        file_size_mb = len(content) / (1024 * 1024)
+        file_size_mb = file_size / (1024 * 1024)
         metrics_logger.log_document_processing(
             agent=agent,
             filename=file.filename,
@@ -115,7 +158,7 @@ async def upload_document(
             file_size_mb=file_size_mb
         )
         
-        total_time = (time.time() - start_time) * 1000
+        total_time = request_timer.elapsed_ms
         logger.info(f"Document processed successfully in {total_time:.2f}ms, created {chunks_created} chunks")
         
         return DocumentUploadResponse(
@@ -141,20 +184,21 @@ async def retrieve_documents(request: RetrievalRequest):
     Returns:
         Retrieved documents with relevance scores
     """
-    start_time = time.time()
+    retrieval_timer = Timer()
     
     try:
         logger.info(f"Retrieving documents for query: {request.query[:100]}... from agent: {request.agent}")
         
         # Perform retrieval
-        results = vector_store_service.search(
+        results = await retrieval_cache.search(
             agent=request.agent,
             query=request.query,
             k=request.top_k,
-            threshold=request.similarity_threshold
+            threshold=request.similarity_threshold,
+            ef_search=request.ef_search
         )
         
-        retrieval_time = (time.time() - start_time) * 1000
+        retrieval_time = retrieval_timer.elapsed_ms
         
         # Format results
         documents = []
@@ -170,7 +214,8 @@ async def retrieve_documents(request: RetrievalRequest):
             agent=request.agent,
             query_length=len(request.query),
             results_count=len(documents),
-            retrieval_time_ms=retrieval_time
+            retrieval_time_ms=retrieval_time,
+            ef_search=request.ef_search or settings.hnsw_ef_search
         )
         
         logger.info(f"Retrieved {len(documents)} documents in {retrieval_time:.2f}ms")
@@ -204,22 +249,31 @@ async def list_agent_documents(agent: str):
         if not agent_dir.exists():
             return {"agent": agent, "documents": [], "total": 0}
         
-        documents = []
-        for file_path in agent_dir.iterdir():
-            if file_path.is_file():
-                stat = file_path.stat()
-                documents.append({
-                    "filename": file_path.name,
-                    "size_mb": stat.st_size / (1024 * 1024),
-                    "modified": stat.st_mtime,
-                    "type": file_path.suffix
-                })
+        # Reuse the last listing while the directory is unchanged
+        mtime = agent_dir.stat().st_mtime_ns
+        cached = _listing_cache.get(agent)
+        if cached and cached[0] == mtime:
+            return cached[1]
         
-        return {
+        documents = []
+        with os.scandir(agent_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    documents.append({
+                        "filename": entry.name,
+                        "size_mb": stat.st_size / (1024 * 1024),
+                        "modified": stat.st_mtime,
+                        "type": Path(entry.name).suffix
+                    })
+        
+        payload = {
             "agent": agent,
             "documents": documents,
             "total": len(documents)
         }
+        _listing_cache[agent] = (mtime, payload)
+        return payload
         
     except Exception as e:
         logger.error(f"Error listing documents: {str(e)}")
@@ -245,6 +299,7 @@ async def delete_document(agent: str, filename: str):
         
         # Remove from vector store
         vector_store_service.remove_document(agent, filename)
+        retrieval_cache.invalidate(agent)
         
         # Delete file
         file_path.unlink()
@@ -271,7 +326,7 @@ async def reindex_agent_documents(agent: str):
     Returns:
         Reindexing status
     """
-    start_time = time.time()
+    request_timer = Timer()
     
     try:
         agent_dir = Path(f"dataset/{agent}")
@@ -282,18 +337,40 @@ async def reindex_agent_documents(agent: str):
         # Clear existing vector store
         vector_store_service.clear_store(agent)
         
-        # Reload all documents
-        total_chunks = 0
-        processed_files = 0
-        
-        for file_path in agent_dir.iterdir():
-            if file_path.is_file():
-                documents = document_loader.load_single_document(str(file_path))
-                chunks = vector_store_service.add_documents(agent, documents)
-                total_chunks += chunks
-                processed_files += 1
-        
-        processing_time = (time.time() - start_time) * 1000
+        # Parse and index files concurrently, at most one file per CPU in flight
+        files = [
+            file_path for file_path in agent_dir.iterdir()
+            if file_path.is_file() and should_index(file_path)
+        ]
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+        
+        failed_files: List[str] = []
+        
+        async def process_one(file_path: Path) -> int:
+            async with semaphore:
+                try:
+                    documents = await loop.run_in_executor(document_pool, load_document_chunks, str(file_path))
+                    return await asyncio.to_thread(
+                        vector_store_service.add_documents, agent, documents, persist=False
+                    )
+                except Exception as e:
+                    # One bad file must not fail the reindex of the others
+                    logger.error(f"Error reindexing {file_path.name}: {str(e)}")
+                    failed_files.append(file_path.name)
+                    return 0
+        
+        try:
+            chunk_counts = await asyncio.gather(*[process_one(file_path) for file_path in files])
+        finally:
+            # Save once after every file is indexed, even if the reindex was interrupted
+            await asyncio.to_thread(vector_store_service.persist, agent)
+            retrieval_cache.invalidate(agent)
+        
+        total_chunks = sum(chunk_counts)
+        processed_files = len(files) - len(failed_files)
+        
+        processing_time = request_timer.elapsed_ms
         
         logger.info(f"Reindexed {processed_files} files with {total_chunks} chunks in {processing_time:.2f}ms")
         
@@ -301,6 +378,7 @@ async def reindex_agent_documents(agent: str):
             "status": "success",
             "agent": agent,
             "files_processed": processed_files,
+            "files_failed": failed_files,
             "total_chunks": total_chunks,
             "processing_time_ms": processing_time
         }
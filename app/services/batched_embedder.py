@@ -0,0 +1,116 @@
+"""
+Batched Embedder - Coalesces concurrent embedding calls into shared batches
+"""
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Dispatch a batch once it holds this many texts or its first request waited this long
+EMBED_MAX_BATCH = 256
+EMBED_MAX_DELAY = 0.01
+
+# Upstream embedding requests allowed in flight at once
+EMBED_MAX_CONCURRENT = 4
+
+class BatchedEmbedder(Embeddings):
+    """Embeddings wrapper that merges concurrent embed_documents calls into one request"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch: int = EMBED_MAX_BATCH,
+        max_delay: float = EMBED_MAX_DELAY,
+        max_concurrent: int = EMBED_MAX_CONCURRENT
+    ):
+        """
+        Initialize batched embedder and start its worker thread
+
+        Args:
+            embeddings: Underlying embedding model
+            max_batch: Target number of texts per upstream request
+            max_delay: Seconds to wait for more requests before dispatching
+            max_concurrent: Batches sent upstream at the same time
+        """
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="embedding-batch")
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, sharing an upstream request with concurrent callers"""
+        if not texts:
+            return []
+
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query (not batched)"""
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a search query asynchronously (not batched)"""
+        return await self.embeddings.aembed_query(text)
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """Block for one request, then gather more until the batch is full or the delay expires"""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_delay
+
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    def _run(self):
+        """Collect batches and hand them to the pool, so several can be upstream at once"""
+        while True:
+            self._pool.submit(self._embed_batch, self._collect())
+
+    def _embed_batch(self, batch: List[Tuple[List[str], Future]]):
+        """Embed one batch and hand each caller its slice of the results"""
+        all_texts = [text for texts, _ in batch for text in texts]
+
+        try:
+            vectors = self.embeddings.embed_documents(all_texts)
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(all_texts)} texts: {str(e)}")
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+
+            # Retry each request alone so one bad input doesn't fail the others sharing its batch
+            for texts, future in batch:
+                try:
+                    future.set_result(self.embeddings.embed_documents(texts))
+                except Exception as retry_error:
+                    future.set_exception(retry_error)
+            return
+
+        start = 0
+        for texts, future in batch:
+            future.set_result(vectors[start:start + len(texts)])
+            start += len(texts)
+
+        if len(batch) > 1:
+            logger.info(f"Embedded {len(all_texts)} texts for {len(batch)} requests in one batch")
@@ -0,0 +1,95 @@
+"""
+Chat History - Conversation history stored as parallel role/content lists
+"""
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Sequence
+
+import tiktoken
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, ChatMessage, HumanMessage, SystemMessage
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Message classes rebuilt from stored roles; other roles come back as ChatMessage
+MESSAGE_TYPES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "system": SystemMessage
+}
+
+@lru_cache(maxsize=4)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the tokenizer for a model, falling back to cl100k_base"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+class TokenCountedChatHistory(BaseChatMessageHistory):
+    """Chat history with a token-count prefix sum for trimming to a budget"""
+
+    def __init__(self, model: str = None):
+        """
+        Initialize empty history
+
+        Args:
+            model: Model whose tokenizer counts message tokens
+        """
+        self.model = model or settings.openai_model
+        self.roles: List[str] = []
+        self.contents: List[str] = []
+        # token_prefix[i] is the token count of the first i messages
+        self.token_prefix: List[int] = [0]
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Rebuild all messages"""
+        return self._build(0)
+
+    def add_message(self, message: BaseMessage):
+        """Append a message and its token count"""
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        role = message.role if isinstance(message, ChatMessage) else message.type
+
+        self.roles.append(role)
+        self.contents.append(content)
+        self.token_prefix.append(self.token_prefix[-1] + len(get_encoding(self.model).encode(content)))
+
+    def add_messages(self, messages: Sequence[BaseMessage]):
+        """Append several messages"""
+        for message in messages:
+            self.add_message(message)
+
+    def messages_within(self, budget: int) -> List[BaseMessage]:
+        """
+        Get the most recent messages whose combined token count fits a budget
+
+        Args:
+            budget: Maximum number of tokens
+
+        Returns:
+            Newest messages, oldest first, totalling at most budget tokens
+        """
+        start = bisect_left(self.token_prefix, self.token_prefix[-1] - budget)
+        return self._build(start)
+
+    def clear(self):
+        """Remove all messages"""
+        self.roles.clear()
+        self.contents.clear()
+        self.token_prefix = [0]
+
+    def _build(self, start: int) -> List[BaseMessage]:
+        """Rebuild message objects from index start onward"""
+        messages = []
+        for role, content in zip(self.roles[start:], self.contents[start:]):
+            message_type = MESSAGE_TYPES.get(role)
+            if message_type:
+                messages.append(message_type(content=content))
+            else:
+                messages.append(ChatMessage(role=role, content=content))
+        return messages
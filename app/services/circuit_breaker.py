@@ -0,0 +1,93 @@
+"""
+Circuit Breaker - Fails fast on a degraded upstream and adapts request timeouts
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bounds for the adaptive timeout, and how many recent latencies it is estimated from
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 10.0
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 20
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Opens after repeated upstream failures and lets one trial call through after a cooldown"""
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Upstream name used in log messages
+            fail_max: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # Start time of the one in-flight half-open trial call, if any
+        self._probe_started: Optional[float] = None
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Check that a call may go upstream
+
+        Raises:
+            CircuitOpenError: If the circuit is open and still cooling down,
+                or another caller's trial call is still in flight
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+
+            # Half-open: let exactly one trial call through. A probe that never reported
+            # back (e.g. cancelled) stops blocking others after another reset_timeout
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} circuit is half-open with a trial call in flight")
+            self._probe_started = now
+
+    def record_success(self, elapsed: float):
+        """Close the circuit and remember the call's latency in seconds"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+            self._latencies.append(elapsed)
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit once fail_max is reached"""
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None:
+                # Failed trial call: stay open for another cooldown
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+                logger.warning(f"Reopened {self.name} circuit after a failed trial call")
+            elif self._failures >= self.fail_max and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.warning(f"Opened {self.name} circuit after {self._failures} consecutive failures")
+
+    @property
+    def timeout(self) -> float:
+        """Request timeout of three times the recent p95 latency, within MIN_TIMEOUT and MAX_TIMEOUT"""
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return MAX_TIMEOUT
+            latencies = sorted(self._latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, 3 * p95))
@@ -1,35 +1,71 @@
 """
 Document Loader Service - Handles loading and processing of various document formats
 """
+import csv
+import math
+import hashlib
 import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler
+from functools import lru_cache
 from typing import List, Dict, Any
 from pathlib import Path
 
 from langchain.document_loaders import (
-    PyPDFLoader,
     TextLoader,
     UnstructuredWordDocumentLoader,
-    UnstructuredMarkdownLoader,
-    CSVLoader
+    UnstructuredMarkdownLoader
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.document_loaders import UnstructuredPDFLoader
 from langchain.schema import Document
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pypdfium2 as pdfium
+from semantic_text_splitter import TextSplitter
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Supported document formats, and file names never worth parsing (hidden files, Office lock files)
+SUPPORTED_EXTS = frozenset({'.pdf', '.txt', '.docx', '.doc', '.md', '.csv'})
+IGNORED_FILE_PREFIXES = ('.', '~$')
+
+# Chunks shorter than this, or with lower character entropy (bits), carry no useful content
+MIN_CHUNK_CHARS = 32
+MIN_CHUNK_ENTROPY = 2.5
+
+# Bytes decoded per CSV record batch
+CSV_BLOCK_SIZE = 1 << 20
+
+# pdfium is not thread-safe, so PDF parsing is serialized across loader threads
+_PDFIUM_LOCK = threading.Lock()
+
+def should_index(file_path: Path) -> bool:
+    """Check whether a file is a supported, non-ignored document"""
+    return (
+        file_path.suffix.lower() in SUPPORTED_EXTS
+        and not file_path.name.startswith(IGNORED_FILE_PREFIXES)
+    )
+
+def _char_entropy(text: str) -> float:
+    """Shannon entropy of a string's characters, in bits"""
+    length = len(text)
+    return -sum(
+        count / length * math.log2(count / length)
+        for count in Counter(text).values()
+    )
+
 class DocumentLoader:
     """Service for loading and processing documents"""
     
     def __init__(self):
         """Initialize document loader with text splitter"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+        # Rust splitter walks the text once, preferring paragraph, line and sentence boundaries
+        self.text_splitter = TextSplitter(
+            capacity=settings.chunk_size,
+            overlap=settings.chunk_overlap
         )
         
         # Map file extensions to loaders
@@ -61,7 +97,7 @@ class DocumentLoader:
         
         # Process each file in the directory
         for file_path in directory.iterdir():
-            if file_path.is_file():
+            if file_path.is_file() and should_index(file_path):
                 try:
                     file_docs = self.load_single_document(str(file_path))
                     documents.extend(file_docs)
@@ -108,8 +144,8 @@ class DocumentLoader:
                     'file_type': file_ext
                 })
             
-            # Split into chunks
-            chunks = self.text_splitter.split_documents(raw_documents)
+            # Split into chunks, dropping ones not worth embedding
+            chunks = self._filter_chunks(self._split_documents(raw_documents))
             
             # Add chunk metadata
             for i, chunk in enumerate(chunks):
@@ -125,10 +161,17 @@ class DocumentLoader:
             raise
     
     def _load_pdf(self, file_path: str) -> List[Document]:
-        """Load PDF document"""
+        """Load PDF document, one Document per page"""
         try:
-            loader = PyPDFLoader(file_path)
-            return loader.load()
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(file_path)
+                try:
+                    return [
+                        Document(page_content=pdf[i].get_textpage().get_text_bounded(), metadata={"page": i})
+                        for i in range(len(pdf))
+                    ]
+                finally:
+                    pdf.close()
         except Exception as e:
             logger.error(f"Error loading PDF {file_path}: {str(e)}")
             # Fallback to unstructured loader
@@ -151,9 +194,32 @@ class DocumentLoader:
         return loader.load()
     
     def _load_csv(self, file_path: str) -> List[Document]:
-        """Load CSV document"""
-        loader = CSVLoader(file_path, encoding='utf-8')
-        return loader.load()
+        """Load CSV document, one Document per decoded record batch"""
+        # Read every column as string so cells keep their raw text (leading zeros, mixed types)
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            header = next(csv.reader(f), [])
+        reader = pacsv.open_csv(
+            file_path,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in header})
+        )
+        names = [name.strip() for name in reader.schema.names]
+        
+        documents = []
+        start_row = 0
+        for batch in reader:
+            columns = [column.to_pylist() for column in batch.columns]
+            # Same "column: value" row layout as CSVLoader, one blank line between rows
+            text = "\n\n".join(
+                "\n".join(f"{name}: {'' if value is None else str(value).strip()}" for name, value in zip(names, row))
+                for row in zip(*columns)
+            )
+            documents.append(Document(
+                page_content=text,
+                metadata={"row": start_row, "rows": batch.num_rows}
+            ))
+            start_row += batch.num_rows
+        return documents
     
     def process_text(self, text: str, metadata: Dict[str, Any] = None) -> List[Document]:
         """
@@ -173,7 +239,7 @@ class DocumentLoader:
         )
         
         # Split into chunks
-        chunks = self.text_splitter.split_documents([document])
+        chunks = self._split_documents([document])
         
         # Add chunk metadata
         for i, chunk in enumerate(chunks):
@@ -184,6 +250,66 @@ class DocumentLoader:
         
         return chunks
     
+    def _split_documents(self, documents: List[Document]) -> List[Document]:
+        """Split documents into chunks, copying each source document's metadata"""
+        return [
+            Document(page_content=chunk, metadata=dict(doc.metadata))
+            for doc in documents
+            for chunk in self.text_splitter.chunks(doc.page_content)
+        ]
+    
+    def _filter_chunks(self, chunks: List[Document]) -> List[Document]:
+        """Drop short, low-entropy and duplicate chunks"""
+        seen = set()
+        filtered = []
+        for chunk in chunks:
+            text = chunk.page_content.strip()
+            if len(text) < MIN_CHUNK_CHARS or _char_entropy(text) < MIN_CHUNK_ENTROPY:
+                continue
+            
+            digest = hashlib.sha1(text.encode("utf-8")).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            filtered.append(chunk)
+        
+        if len(filtered) < len(chunks):
+            logger.info(f"Skipped {len(chunks) - len(filtered)} non-informative chunks")
+        return filtered
+    
     def get_supported_formats(self) -> List[str]:
         """Get list of supported file formats"""
         return list(self.loader_mapping.keys())
+
+def init_worker_logging(log_queue):
+    """
+    Send a worker process's log records to the parent through a queue
+    
+    Used as a process pool initializer; spawned workers start without the
+    parent's logging setup, so records would otherwise be dropped.
+    
+    Args:
+        log_queue: multiprocessing queue drained by a listener in the parent
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+@lru_cache(maxsize=1)
+def _process_loader() -> DocumentLoader:
+    """Get the document loader for the current process"""
+    return DocumentLoader()
+
+def load_document_chunks(file_path: str) -> List[Document]:
+    """
+    Load and chunk a single document with a per-process loader
+    
+    Module-level so it can be submitted to a process pool.
+    
+    Args:
+        file_path: Path to the document file
+        
+    Returns:
+        List of document chunks
+    """
+    return _process_loader().load_single_document(file_path)
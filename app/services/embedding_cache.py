@@ -0,0 +1,161 @@
+"""
+Embedding Cache - Persists document embeddings by content fingerprint
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """SQLite-backed store of embedding vectors keyed by content fingerprint"""
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the cache database
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (fingerprint TEXT PRIMARY KEY, vec BLOB)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def fingerprint(text: str, model: str) -> str:
+        """
+        Build the cache key for a chunk of text
+
+        Combines the embedding model and chunking parameters with the
+        content, so a model or chunking change never returns stale vectors.
+
+        Args:
+            text: Chunk content
+            model: Embedding model name
+
+        Returns:
+            Hex SHA-256 fingerprint
+        """
+        prefix = f"{model}|{settings.chunk_size}|{settings.chunk_overlap}|"
+        return hashlib.sha256(prefix.encode("utf-8") + text.encode("utf-8")).hexdigest()
+
+    def get_many(self, fingerprints: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for the given fingerprints"""
+        found: Dict[str, List[float]] = {}
+        if not fingerprints:
+            return found
+
+        unique = list(dict.fromkeys(fingerprints))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT fingerprint, vec FROM embeddings WHERE fingerprint IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for fingerprint, blob in rows:
+                    found[fingerprint] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors by fingerprint"""
+        if not items:
+            return
+
+        rows = [
+            (fingerprint, np.asarray(vector, dtype=np.float32).tobytes())
+            for fingerprint, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (fingerprint, vec) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model: str,
+        query_cache_size: Optional[int] = None
+    ):
+        """
+        Initialize cached embeddings
+
+        Args:
+            embeddings: Underlying embedding model
+            cache: Persistent embedding cache
+            model: Embedding model name, part of every fingerprint
+            query_cache_size: Maximum number of query embeddings kept in memory
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        # Hot search queries by exact text; in memory only, unlike document vectors
+        self._query_cache: LRUCache = LRUCache(maxsize=query_cache_size or settings.query_embedding_cache_size)
+        self._query_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached vectors for previously seen content"""
+        fingerprints = [EmbeddingCache.fingerprint(text, self.model) for text in texts]
+        vectors = self.cache.get_many(fingerprints)
+
+        # Embed each distinct missing text once
+        missing: Dict[str, str] = {}
+        for fingerprint, text in zip(fingerprints, texts):
+            if fingerprint not in vectors:
+                missing.setdefault(fingerprint, text)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(computed)
+            vectors.update(computed)
+
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [vectors[fingerprint] for fingerprint in fingerprints]
+
+    def _cached_query(self, text: str) -> Optional[List[float]]:
+        """Get a query embedding from the in-memory LRU"""
+        with self._query_lock:
+            return self._query_cache.get(text)
+
+    def _store_query(self, text: str, vector: List[float]):
+        """Remember a query embedding in the in-memory LRU"""
+        with self._query_lock:
+            self._query_cache[text] = vector
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query, reusing recent embeddings of the same text"""
+        vector = self._cached_query(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store_query(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a search query asynchronously, reusing recent embeddings of the same text"""
+        vector = self._cached_query(text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._store_query(text, vector)
+        return vector
@@ -1,16 +1,69 @@
 """
 Metrics Logger - Tracks and logs system performance metrics
 """
-import json
+import time
+import queue
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from pathlib import Path
 import threading
 from collections import defaultdict, deque
+from itertools import islice
+
+import numpy as np
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Background writer: flush after this many entries or this many seconds
+METRICS_BATCH_SIZE = 100
+METRICS_FLUSH_INTERVAL = 0.25
+METRICS_QUEUE_SIZE = 10000
+
+# Roll metrics.jsonl over to metrics.jsonl.1 past this size
+METRICS_MAX_BYTES = 128 << 20
+
+# Summaries cover the most recent entries of each type, maintained as running sums
+SUMMARY_WINDOWS = {
+    "stt": 100,
+    "tts": 100,
+    "chat": 100,
+    "retrieval": 100,
+    "document": 50
+}
+ROLLING_FIELDS = {
+    "stt": ("duration_ms", "file_size_mb"),
+    "tts": ("duration_ms", "audio_size_kb"),
+    "chat": ("response_time_ms", "tokens_used"),
+    "retrieval": ("retrieval_time_ms", "results_count"),
+    "document": ("chunks", "processing_time_ms")
+}
+
+# Sentinel telling the writer thread to flush and exit
+_STOP = object()
+
+class Timer:
+    """Measures elapsed time with perf_counter_ns, usable as a context manager"""
+    
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+    
+    def __enter__(self) -> "Timer":
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.end_ns = time.perf_counter_ns()
+    
+    @property
+    def elapsed_ms(self) -> float:
+        """Elapsed milliseconds, up to now if the timer is still running"""
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end_ns - self.start_ns) / 1e6
+
 class MetricsLogger:
     """Singleton class for logging system metrics"""
     
@@ -44,28 +97,90 @@ class MetricsLogger:
             "feedback": deque(maxlen=1000)
         }
         
-        # Aggregated metrics
-        self.aggregated = defaultdict(lambda: {
-            "count": 0,
-            "total_time": 0,
-            "avg_time": 0,
-            "min_time": float('inf'),
-            "max_time": 0
-        })
+        # Aggregated metrics, accumulated per thread and merged on read
+        self._local = threading.local()
+        self._buckets: List[Dict[str, Dict[str, float]]] = []
+        self._buckets_lock = threading.Lock()
+        
+        # Running sums over each summary window, plus per-agent chat sums
+        self.rolling = {
+            metric_type: dict.fromkeys(("count",) + fields, 0)
+            for metric_type, fields in ROLLING_FIELDS.items()
+        }
+        self.rolling_chat_by_agent: Dict[str, Dict[str, float]] = {}
+        
+        # Metric file writes happen on a background thread with one long-lived handle
+        self._queue: queue.Queue = queue.Queue(maxsize=METRICS_QUEUE_SIZE)
+        self.dropped_metrics = 0
+        self._writer = threading.Thread(target=self._drain_queue, name="metrics-writer", daemon=True)
+        self._writer.start()
     
-    def _write_metric(self, metric_type: str, data: Dict[str, Any]):
-        """Write metric to file"""
+    def close(self, timeout: float = 5.0):
+        """Stop the background writer after it flushes queued entries"""
+        if not self._writer.is_alive():
+            return
+        
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+    
+    def _drain_queue(self):
+        """Write queued entries, flushing every batch or flush interval"""
+        f = None
         try:
-            metric_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "type": metric_type,
-                "data": data
-            }
+            f = open(self.metrics_file, "ab")
+            pending = 0
+            last_flush = time.monotonic()
             
-            with open(self.metrics_file, "a") as f:
-                f.write(json.dumps(metric_entry) + "\n")
+            while True:
+                try:
+                    entry = self._queue.get(timeout=METRICS_FLUSH_INTERVAL)
+                except queue.Empty:
+                    entry = None
+                
+                if entry is _STOP:
+                    f.flush()
+                    return
+                
+                if entry is not None:
+                    try:
+                        f.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+                        pending += 1
+                    except Exception as e:
+                        logger.error(f"Error writing metric: {str(e)}")
+                
+                now = time.monotonic()
+                if pending and (pending >= METRICS_BATCH_SIZE or now - last_flush >= METRICS_FLUSH_INTERVAL):
+                    f.flush()
+                    pending = 0
+                    last_flush = now
+                    
+                    if f.tell() > METRICS_MAX_BYTES:
+                        f = self._rotate(f)
         except Exception as e:
-            logger.error(f"Error writing metric: {str(e)}")
+            logger.error(f"Metrics writer stopped: {str(e)}")
+        finally:
+            if f is not None:
+                f.close()
+    
+    def _rotate(self, f):
+        """Move the full metrics file to metrics.jsonl.1 and reopen an empty one"""
+        f.close()
+        self.metrics_file.replace(self.metrics_file.with_name(self.metrics_file.name + ".1"))
+        logger.info(f"Rotated {self.metrics_file}")
+        return open(self.metrics_file, "ab")
+    
+    def _write_metric(self, metric_type: str, data: Dict[str, Any]):
+        """Queue metric for the background writer"""
+        metric_entry = {
+            "timestamp": time.time_ns() // 1000,
+            "type": metric_type,
+            "data": data
+        }
+        
+        try:
+            self._queue.put_nowait(metric_entry)
+        except queue.Full:
+            self.dropped_metrics += 1
     
     def log_stt_metrics(self, duration_ms: float, file_size_mb: float, text_length: int):
         """Log speech-to-text metrics"""
@@ -76,7 +191,7 @@ class MetricsLogger:
             "chars_per_second": (text_length / duration_ms * 1000) if duration_ms > 0 else 0
         }
         
-        self.metrics["stt"].append(metric)
+        self._append("stt", metric)
         self._write_metric("stt", metric)
         self._update_aggregated("stt", duration_ms)
     
@@ -89,7 +204,7 @@ class MetricsLogger:
             "chars_per_second": (text_length / duration_ms * 1000) if duration_ms > 0 else 0
         }
         
-        self.metrics["tts"].append(metric)
+        self._append("tts", metric)
         self._write_metric("tts", metric)
         self._update_aggregated("tts", duration_ms)
     
@@ -108,7 +223,7 @@ class MetricsLogger:
             "tokens_used": tokens_used
         }
         
-        self.metrics["chat"].append(metric)
+        self._append("chat", metric)
         self._write_metric("chat", metric)
         self._update_aggregated(f"chat_{agent}", response_time_ms)
     
@@ -117,17 +232,19 @@ class MetricsLogger:
         agent: str,
         query_length: int,
         results_count: int,
-        retrieval_time_ms: float
+        retrieval_time_ms: float,
+        ef_search: Optional[int] = None
     ):
         """Log document retrieval metrics"""
         metric = {
             "agent": agent,
             "query_length": query_length,
             "results_count": results_count,
-            "retrieval_time_ms": retrieval_time_ms
+            "retrieval_time_ms": retrieval_time_ms,
+            "ef_search": ef_search
         }
         
-        self.metrics["retrieval"].append(metric)
+        self._append("retrieval", metric)
         self._write_metric("retrieval", metric)
         self._update_aggregated(f"retrieval_{agent}", retrieval_time_ms)
     
@@ -149,7 +266,7 @@ class MetricsLogger:
             "chunks_per_mb": chunks / file_size_mb if file_size_mb > 0 else 0
         }
         
-        self.metrics["document"].append(metric)
+        self._append("document", metric)
         self._write_metric("document", metric)
         self._update_aggregated("document_processing", processing_time_ms)
     
@@ -171,77 +288,141 @@ class MetricsLogger:
         self.metrics["feedback"].append(metric)
         self._write_metric("feedback", metric)
     
+    def _append(self, metric_type: str, metric: Dict[str, Any]):
+        """Store a metric and update the running sums of its summary window"""
+        entries = self.metrics[metric_type]
+        window = SUMMARY_WINDOWS[metric_type]
+        
+        # The oldest entry in the window drops out once this one is added
+        if len(entries) >= window:
+            self._accumulate(metric_type, entries[-window], -1)
+        
+        entries.append(metric)
+        self._accumulate(metric_type, metric, 1)
+    
+    def _accumulate(self, metric_type: str, metric: Dict[str, Any], sign: int):
+        """Add (sign=1) or remove (sign=-1) a metric from the running sums"""
+        bucket = self.rolling[metric_type]
+        bucket["count"] += sign
+        for field in ROLLING_FIELDS[metric_type]:
+            bucket[field] += sign * metric[field]
+        
+        if metric_type == "chat":
+            agent = metric["agent"]
+            agent_bucket = self.rolling_chat_by_agent.setdefault(
+                agent, {"count": 0, "response_time_ms": 0, "tokens_used": 0}
+            )
+            agent_bucket["count"] += sign
+            agent_bucket["response_time_ms"] += sign * metric["response_time_ms"]
+            agent_bucket["tokens_used"] += sign * metric["tokens_used"]
+            if agent_bucket["count"] <= 0:
+                del self.rolling_chat_by_agent[agent]
+    
+    def _average(self, metric_type: str, field: str) -> float:
+        """Average of a field over its summary window"""
+        bucket = self.rolling[metric_type]
+        return bucket[field] / bucket["count"] if bucket["count"] else 0
+    
+    def _recent(self, metric_type: str, n: int) -> List[Dict[str, Any]]:
+        """Most recent n entries of a metric type, oldest first"""
+        return list(islice(reversed(self.metrics[metric_type]), n))[::-1]
+    
+    def _local_bucket(self) -> Dict[str, Dict[str, float]]:
+        """Get this thread's aggregate bucket, registering it on first use"""
+        bucket = getattr(self._local, "bucket", None)
+        if bucket is None:
+            bucket = defaultdict(lambda: {
+                "count": 0,
+                "total_time": 0,
+                "min_time": float('inf'),
+                "max_time": 0
+            })
+            self._local.bucket = bucket
+            with self._buckets_lock:
+                self._buckets.append(bucket)
+        return bucket
+    
     def _update_aggregated(self, key: str, time_ms: float):
-        """Update aggregated metrics"""
-        agg = self.aggregated[key]
+        """Update aggregated metrics in the calling thread's bucket"""
+        agg = self._local_bucket()[key]
         agg["count"] += 1
         agg["total_time"] += time_ms
-        agg["avg_time"] = agg["total_time"] / agg["count"]
-        agg["min_time"] = min(agg["min_time"], time_ms)
-        agg["max_time"] = max(agg["max_time"], time_ms)
+        if time_ms < agg["min_time"]:
+            agg["min_time"] = time_ms
+        if time_ms > agg["max_time"]:
+            agg["max_time"] = time_ms
+    
+    @property
+    def aggregated(self) -> Dict[str, Dict[str, float]]:
+        """Aggregated metrics merged across every thread's bucket"""
+        with self._buckets_lock:
+            buckets = list(self._buckets)
+        
+        merged: Dict[str, Dict[str, float]] = {}
+        for bucket in buckets:
+            for key, agg in list(bucket.items()):
+                total = merged.setdefault(key, {
+                    "count": 0,
+                    "total_time": 0,
+                    "avg_time": 0,
+                    "min_time": float('inf'),
+                    "max_time": 0
+                })
+                total["count"] += agg["count"]
+                total["total_time"] += agg["total_time"]
+                total["min_time"] = min(total["min_time"], agg["min_time"])
+                total["max_time"] = max(total["max_time"], agg["max_time"])
+        
+        for total in merged.values():
+            total["avg_time"] = total["total_time"] / total["count"] if total["count"] else 0
+        return merged
     
     def get_audio_metrics(self) -> Dict[str, Any]:
         """Get audio processing metrics summary"""
-        stt_metrics = list(self.metrics["stt"])[-100:]  # Last 100
-        tts_metrics = list(self.metrics["tts"])[-100:]
-        
         return {
             "stt": {
-                "total_processed": len(stt_metrics),
-                "avg_duration_ms": sum(m["duration_ms"] for m in stt_metrics) / len(stt_metrics) if stt_metrics else 0,
-                "avg_file_size_mb": sum(m["file_size_mb"] for m in stt_metrics) / len(stt_metrics) if stt_metrics else 0,
-                "recent": stt_metrics[-5:] if stt_metrics else []
+                "total_processed": self.rolling["stt"]["count"],
+                "avg_duration_ms": self._average("stt", "duration_ms"),
+                "avg_file_size_mb": self._average("stt", "file_size_mb"),
+                "recent": self._recent("stt", 5)
             },
             "tts": {
-                "total_processed": len(tts_metrics),
-                "avg_duration_ms": sum(m["duration_ms"] for m in tts_metrics) / len(tts_metrics) if tts_metrics else 0,
-                "avg_audio_size_kb": sum(m["audio_size_kb"] for m in tts_metrics) / len(tts_metrics) if tts_metrics else 0,
-                "recent": tts_metrics[-5:] if tts_metrics else []
+                "total_processed": self.rolling["tts"]["count"],
+                "avg_duration_ms": self._average("tts", "duration_ms"),
+                "avg_audio_size_kb": self._average("tts", "audio_size_kb"),
+                "recent": self._recent("tts", 5)
             }
         }
     
     def get_chat_metrics(self) -> Dict[str, Any]:
         """Get chat metrics summary"""
-        chat_metrics = list(self.metrics["chat"])[-100:]
-        
-        # Group by agent
-        agent_metrics = defaultdict(list)
-        for metric in chat_metrics:
-            agent_metrics[metric["agent"]].append(metric)
-        
-        summary = {
-            "total_interactions": len(chat_metrics),
-            "by_agent": {}
+        return {
+            "total_interactions": self.rolling["chat"]["count"],
+            "by_agent": {
+                agent: {
+                    "count": bucket["count"],
+                    "avg_response_time_ms": bucket["response_time_ms"] / bucket["count"],
+                    "total_tokens": bucket["tokens_used"]
+                }
+                for agent, bucket in self.rolling_chat_by_agent.items()
+            },
+            "recent": self._recent("chat", 10)
         }
-        
-        for agent, metrics in agent_metrics.items():
-            summary["by_agent"][agent] = {
-                "count": len(metrics),
-                "avg_response_time_ms": sum(m["response_time_ms"] for m in metrics) / len(metrics),
-                "total_tokens": sum(m["tokens_used"] for m in metrics)
-            }
-        
-        summary["recent"] = chat_metrics[-10:] if chat_metrics else []
-        
-        return summary
     
     def get_rag_metrics(self) -> Dict[str, Any]:
         """Get RAG metrics summary"""
-        retrieval_metrics = list(self.metrics["retrieval"])[-100:]
-        document_metrics = list(self.metrics["document"])[-50:]
-        
         return {
             "retrieval": {
-                "total_queries": len(retrieval_metrics),
-                "avg_retrieval_time_ms": sum(m["retrieval_time_ms"] for m in retrieval_metrics) / len(retrieval_metrics) if retrieval_metrics else 0,
-                "avg_results_count": sum(m["results_count"] for m in retrieval_metrics) / len(retrieval_metrics) if retrieval_metrics else 0,
-                "recent": retrieval_metrics[-5:] if retrieval_metrics else []
+                "total_queries": self.rolling["retrieval"]["count"],
+                "avg_retrieval_time_ms": self._average("retrieval", "retrieval_time_ms"),
+                "avg_results_count": self._average("retrieval", "results_count"),
+                "recent": self._recent("retrieval", 5)
             },
             "document_processing": {
-                "total_documents": len(document_metrics),
-                "total_chunks": sum(m["chunks"] for m in document_metrics),
-                "avg_processing_time_ms": sum(m["processing_time_ms"] for m in document_metrics) / len(document_metrics) if document_metrics else 0,
-                "recent": document_metrics[-5:] if document_metrics else []
+                "total_documents": self.rolling["document"]["count"],
+                "total_chunks": self.rolling["document"]["chunks"],
+                "avg_processing_time_ms": self._average("document", "processing_time_ms"),
+                "recent": self._recent("document", 5)
             }
         }
     
@@ -249,7 +430,7 @@ class MetricsLogger:
         """Get overall system metrics"""
         return {
             "timestamp": datetime.now().isoformat(),
-            "aggregated": dict(self.aggregated),
+            "aggregated": self.aggregated,
             "audio": self.get_audio_metrics(),
             "chat": self.get_chat_metrics(),
             "rag": self.get_rag_metrics(),
@@ -258,20 +439,16 @@ class MetricsLogger:
     
     def _get_feedback_summary(self) -> Dict[str, Any]:
         """Get feedback summary"""
-        feedback = list(self.metrics["feedback"])
+        feedback = self.metrics["feedback"]
         
         if not feedback:
             return {"count": 0, "average_rating": 0}
         
-        ratings = [f["rating"] for f in feedback]
+        ratings = np.fromiter((f["rating"] for f in feedback), dtype=np.int64, count=len(feedback))
+        # Ratings are not range-checked on submission, so only bin 1-5
+        counts = np.bincount(ratings[(ratings >= 1) & (ratings <= 5)], minlength=6)
         return {
-            "count": len(feedback),
-            "average_rating": sum(ratings) / len(ratings),
-            "distribution": {
-                "1": ratings.count(1),
-                "2": ratings.count(2),
-                "3": ratings.count(3),
-                "4": ratings.count(4),
-                "5": ratings.count(5)
-            }
+            "count": int(ratings.size),
+            "average_rating": float(ratings.mean()),
+            "distribution": {str(i): int(counts[i]) for i in range(1, 6)}
         }
@@ -1,18 +1,135 @@
 """
 Orchestrator Agent - Routes queries to appropriate specialized agents
 """
+import re
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-import json
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Any, FrozenSet, List, Optional, Set, Tuple
 
+import ahocorasick
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import SystemMessage, HumanMessage
 
-from app.config import settings, ORCHESTRATOR_CONFIG
+from app.config import settings, ORCHESTRATOR_CONFIG, AGENT_NAMES
+from app.services.route_classifier import RouteClassifier
 
 logger = logging.getLogger(__name__)
 
+# Keyword routing table, checked in order; the first matching agent wins
+KEYWORD_ROUTES = (
+    # Specific keywords that should go to general agent
+    ("general", ('weather', 'temperature', 'forecast', 'rain', 'sunny',
+                 'calculate', 'math', 'time', 'timezone', 'what time',
+                 'hello', 'hi', 'how are you', 'thank')),
+    ("medical", ('sick', 'ill', 'pain', 'symptom', 'disease', 'health',
+                 'medical', 'doctor', 'medicine', 'treatment', 'diagnosis')),
+    ("ai_ml", ('ai', 'ml', 'machine learning', 'neural', 'deep learning',
+               'model', 'algorithm', 'training', 'dataset', 'tensorflow',
+               'pytorch', 'scikit', 'nlp', 'computer vision')),
+    ("real_estate", ('property', 'house', 'apartment', 'real estate',
+                     'mortgage', 'rent', 'buy house', 'sell house')),
+    ("sales", ('sales', 'customer', 'client', 'revenue', 'deal',
+               'lead', 'crm', 'pipeline', 'quota', 'prospect')),
+    ("education", ('learn', 'study', 'education', 'course', 'teach',
+                   'school', 'university', 'exam', 'homework', 'curriculum'))
+)
+
+# Outermost JSON object in an LLM routing response
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Words for response shingling, ignoring punctuation
+_WORD_RE = re.compile(r"\w+")
+
+# Secondary responses sharing more 3-word shingles than this with a kept response are dropped
+DUPLICATE_JACCARD = 0.85
+
+# Multi-domain indicators for complexity analysis
+DOMAIN_KEYWORDS = (
+    ("real_estate", ("property", "house", "apartment", "mortgage", "real estate")),
+    ("medical", ("health", "medical", "symptom", "treatment", "disease")),
+    ("ai_ml", ("AI", "machine learning", "neural", "algorithm", "model")),
+    ("sales", ("sales", "customer", "revenue", "marketing", "lead")),
+    ("education", ("learn", "study", "course", "education", "teach"))
+)
+COMPARISON_WORDS = ("compare", "versus", "vs", "difference", "better", "choose")
+TECHNICAL_WORDS = ("implement", "architecture", "optimize", "integrate", "develop")
+
+def _build_automaton() -> ahocorasick.Automaton:
+    """Build one Aho-Corasick automaton mapping each lowercase keyword to its owners"""
+    owners: Dict[str, List[Tuple[str, str]]] = {}
+    tables = (
+        ("route", KEYWORD_ROUTES),
+        ("domain", DOMAIN_KEYWORDS),
+        ("complexity", (("comparison", COMPARISON_WORDS), ("technical", TECHNICAL_WORDS)))
+    )
+    for table, entries in tables:
+        for name, keywords in entries:
+            for keyword in keywords:
+                owners.setdefault(keyword.lower(), []).append((table, name))
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, keyword_owners in owners.items():
+        automaton.add_word(keyword, (len(keyword), tuple(keyword_owners)))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_automaton()
+
+def _shingles(text: str) -> FrozenSet[Tuple[str, ...]]:
+    """Get the set of 3-word shingles of a text, or its words if shorter"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return frozenset([tuple(words)])
+    return frozenset(zip(words, words[1:], words[2:]))
+
+def drop_near_duplicates(primary: str, responses: Dict[str, str]) -> Dict[str, str]:
+    """
+    Remove secondary responses that repeat the primary or an earlier secondary
+    
+    Args:
+        primary: Primary agent response, always kept
+        responses: Secondary responses by agent name
+        
+    Returns:
+        Secondary responses whose shingle Jaccard similarity with every kept response is at most DUPLICATE_JACCARD
+    """
+    kept_shingles = [_shingles(primary)]
+    kept = {}
+    for agent, response in responses.items():
+        shingles = _shingles(response)
+        if any(len(shingles & other) > DUPLICATE_JACCARD * len(shingles | other) for other in kept_shingles):
+            logger.info("Dropping near-duplicate response from %s", agent)
+            continue
+        kept_shingles.append(shingles)
+        kept[agent] = response
+    return kept
+
+@lru_cache(maxsize=256)
+def keyword_matches(query: str) -> FrozenSet[Tuple[str, str]]:
+    """
+    Find every keyword table entry mentioned in a query in one pass
+    
+    Keywords only match at the start of a word, so "ai" does not match "said".
+    Cached so routing and complexity analysis of the same query share one scan.
+    
+    Args:
+        query: User query
+        
+    Returns:
+        Set of (table, name) pairs, e.g. ("route", "medical")
+    """
+    # islower() scans without allocating; only copy when there is uppercase to fold
+    text = query if query.islower() else query.lower()
+    matches: Set[Tuple[str, str]] = set()
+    for end, (length, owners) in _KEYWORD_AUTOMATON.iter(text):
+        start = end - length + 1
+        if start == 0 or not (text[start - 1].isalnum() or text[start - 1] == "_"):
+            matches.update(owners)
+    return frozenset(matches)
+
 class OrchestratorAgent:
     """Master orchestrator for routing queries to specialized agents"""
     
@@ -26,6 +143,12 @@ class OrchestratorAgent:
         
         self.system_prompt = ORCHESTRATOR_CONFIG["system_prompt"]
         
+        # Local classifier for queries the keyword table misses
+        self.classifier = RouteClassifier(KEYWORD_ROUTES)
+        
+        # LLM routing decisions by normalized query, and in-flight LLM calls
+        self._pending_routes: Dict[str, asyncio.Future] = {}
+        
         # Create routing prompt
         self.routing_prompt = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
@@ -52,6 +175,44 @@ class OrchestratorAgent:
                 """)
         ])
     
+    def keyword_route(self, query: str) -> Optional[str]:
+        """
+        Route a query using keyword matching only
+        
+        Args:
+            query: User query to route
+            
+        Returns:
+            Name of the matched agent, or None if no keywords matched
+        """
+        matches = keyword_matches(query)
+        if not matches:
+            return None
+        
+        for agent, _ in KEYWORD_ROUTES:
+            if ("route", agent) in matches:
+                logger.info("Routing to %s agent for query: %.50s...", agent, query)
+                return agent
+        
+        return None
+    
+    def classifier_route(self, query: str) -> Optional[str]:
+        """
+        Route a query with the local classifier
+        
+        Args:
+            query: User query to route
+            
+        Returns:
+            Name of the predicted agent, or None if below route_classifier_threshold
+        """
+        agent, probability = self.classifier.predict(query)
+        if probability < settings.route_classifier_threshold:
+            return None
+        
+        logger.info("Classifier routed to %s (p=%.2f) for query: %.50s...", agent, probability, query)
+        return agent
+    
     async def route_query(self, query: str) -> str:
         """
         Route a query to the appropriate agent
@@ -63,55 +224,66 @@ class OrchestratorAgent:
             Name of the selected agent
         """
         try:
-            # Check for specific keywords that should go to general agent
-            general_keywords = ['weather', 'temperature', 'forecast', 'rain', 'sunny', 
-                              'calculate', 'math', 'time', 'timezone', 'what time',
-                              'hello', 'hi', 'how are you', 'thank']
-            
-            query_lower = query.lower()
-            
             # Quick routing for obvious cases
-            if any(keyword in query_lower for keyword in general_keywords):
-                logger.info(f"Routing to general agent for query: {query[:50]}...")
-                return "general"
+            keyword_agent = self.keyword_route(query)
+            if keyword_agent:
+                return keyword_agent
             
-            # Check for medical keywords
-            medical_keywords = ['sick', 'ill', 'pain', 'symptom', 'disease', 'health', 
-                              'medical', 'doctor', 'medicine', 'treatment', 'diagnosis']
-            if any(keyword in query_lower for keyword in medical_keywords):
-                logger.info(f"Routing to medical agent for query: {query[:50]}...")
-                return "medical"
+            # Confident local classification avoids the LLM round trip
+            classifier_agent = self.classifier_route(query)
+            if classifier_agent:
+                return classifier_agent
             
-            # Check for AI/ML keywords
-            ai_keywords = ['ai', 'ml', 'machine learning', 'neural', 'deep learning',
-                          'model', 'algorithm', 'training', 'dataset', 'tensorflow',
-                          'pytorch', 'scikit', 'nlp', 'computer vision']
-            if any(keyword in query_lower for keyword in ai_keywords):
-                logger.info(f"Routing to ai_ml agent for query: {query[:50]}...")
-                return "ai_ml"
+            return await self.resolve_route(query) or "general"
+                
+        except Exception as e:
+            logger.error(f"Error in route_query: {str(e)}")
+            return "general"  # Default fallback
+    
+    async def resolve_route(self, query: str) -> Optional[str]:
+        """
+        Route a query with the LLM, skipping keyword and classifier routing
+        
+        Args:
+            query: User query to route
             
-            # Check for real estate keywords
-            real_estate_keywords = ['property', 'house', 'apartment', 'real estate',
-                                   'mortgage', 'rent', 'buy house', 'sell house']
-            if any(keyword in query_lower for keyword in real_estate_keywords):
-                logger.info(f"Routing to real_estate agent for query: {query[:50]}...")
-                return "real_estate"
+        Returns:
+            Name of the selected agent, or None if the LLM could not decide
+        """
+        try:
+            # Decisions are cached by RoutingCache; this only shares one LLM call
+            # between concurrent identical queries
+            key = " ".join(query.lower().split())
+            pending = self._pending_routes.get(key)
+            if pending:
+                return await asyncio.shield(pending)
             
-            # Check for sales keywords
-            sales_keywords = ['sales', 'customer', 'client', 'revenue', 'deal',
-                            'lead', 'crm', 'pipeline', 'quota', 'prospect']
-            if any(keyword in query_lower for keyword in sales_keywords):
-                logger.info(f"Routing to sales agent for query: {query[:50]}...")
-                return "sales"
+            pending = asyncio.get_running_loop().create_future()
+            self._pending_routes[key] = pending
+            agent = None
+            try:
+                agent = await self._llm_route(query)
+            finally:
+                del self._pending_routes[key]
+                pending.set_result(agent)
             
-            # Check for education keywords
-            education_keywords = ['learn', 'study', 'education', 'course', 'teach',
-                                'school', 'university', 'exam', 'homework', 'curriculum']
-            if any(keyword in query_lower for keyword in education_keywords):
-                logger.info(f"Routing to education agent for query: {query[:50]}...")
-                return "education"
+            return agent
+                
+        except Exception as e:
+            logger.error(f"Error in resolve_route: {str(e)}")
+            return None
+    
+    async def _llm_route(self, query: str) -> Optional[str]:
+        """
+        Route a query with the LLM
+        
+        Args:
+            query: User query to route
             
-            # If no specific match, use LLM for routing
+        Returns:
+            Name of the selected agent, or None if the LLM call or parse failed
+        """
+        try:
             messages = self.routing_prompt.format_messages(query=query)
             response = await self.llm.ainvoke(messages)
             
@@ -121,36 +293,76 @@ class OrchestratorAgent:
                 response_text = response.content
                 
                 # Try to find JSON in the response
-                import re
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+                json_match = _JSON_RE.search(response_text)
                 if json_match:
-                    routing_decision = json.loads(json_match.group())
+                    routing_decision = orjson.loads(json_match.group())
                 else:
                     # Default to general agent
                     logger.warning(f"Could not parse routing response: {response_text}")
-                    return "general"
+                    return None
                 
                 primary_agent = routing_decision.get("primary_agent", "general")
                 confidence = routing_decision.get("confidence", 0)
                 reasoning = routing_decision.get("reasoning", "")
                 
-                logger.info(f"Routing decision: {primary_agent} (confidence: {confidence}) - {reasoning}")
+                logger.info("Routing decision: %s (confidence: %s) - %s", primary_agent, confidence, reasoning)
                 
                 # Validate agent name
-                valid_agents = ["general", "real_estate", "medical", "ai_ml", "sales", "education"]
-                if primary_agent not in valid_agents:
-                    logger.warning(f"Invalid agent name: {primary_agent}, using general")
-                    return "general"
+                if primary_agent not in AGENT_NAMES:
+                    logger.warning(f"Invalid agent name: {primary_agent}")
+                    return None
                 
                 return primary_agent
                 
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Error parsing routing response: {str(e)}")
-                return "general"  # Default fallback
+                return None
                 
         except Exception as e:
-            logger.error(f"Error in route_query: {str(e)}")
-            return "general"  # Default fallback
+            logger.error(f"Error in LLM routing: {str(e)}")
+            return None
+    
+    async def multi_agent_answer(
+        self,
+        query: str,
+        primary_name: str,
+        secondary_names: List[str],
+        factory: Callable[[str, str], Awaitable[str]]
+    ) -> str:
+        """
+        Answer a query with several agents running concurrently
+        
+        Args:
+            query: Original user query
+            primary_name: Agent providing the main answer
+            secondary_names: Agents providing supporting context
+            factory: Coroutine function returning an agent's response for (agent_name, query)
+            
+        Returns:
+            Coordinated response, or the primary response when no secondary agent answered
+        """
+        names = [primary_name, *secondary_names]
+        results = await asyncio.gather(
+            *[factory(name, query) for name in names],
+            return_exceptions=True
+        )
+        
+        primary_response = results[0]
+        if isinstance(primary_response, BaseException):
+            raise primary_response
+        
+        secondary_responses = {}
+        for name, result in zip(secondary_names, results[1:]):
+            if isinstance(result, BaseException):
+                logger.error(f"Secondary agent {name} failed: {str(result)}")
+            else:
+                secondary_responses[name] = result
+        
+        secondary_responses = drop_near_duplicates(primary_response, secondary_responses)
+        if not secondary_responses:
+            return primary_response
+        
+        return await self.coordinate_multi_agent_response(query, primary_response, secondary_responses)
     
     async def coordinate_multi_agent_response(
         self,
@@ -170,19 +382,17 @@ class OrchestratorAgent:
             Coordinated response
         """
         try:
-            # Create coordination prompt
-            coord_prompt = f"""
+            # Create coordination prompt in one join
+            parts = [f"""
                 You are coordinating responses from multiple specialized agents for this query: {query}
 
                 Primary response (main answer):
                 {primary_agent_response}
 
                 Additional context from other agents:
-                """
-            for agent, response in secondary_responses.items():
-                coord_prompt += f"\n{agent}: {response}\n"
-            
-            coord_prompt += """
+                """]
+            parts.extend(f"\n{agent}: {response}\n" for agent, response in secondary_responses.items())
+            parts.append("""
                 Please synthesize these responses into a comprehensive, coherent answer that:
                 1. Prioritizes the primary response
                 2. Incorporates relevant additional context
@@ -190,7 +400,8 @@ class OrchestratorAgent:
                 4. Provides a natural, unified response
 
                 Synthesized response:
-                """
+                """)
+            coord_prompt = "".join(parts)
             
             # Get coordinated response
             messages = [
@@ -224,31 +435,31 @@ class OrchestratorAgent:
                 "requires_context": False
             }
             
-            # Check for multi-domain indicators
-            domain_keywords = {
-                "real_estate": ["property", "house", "apartment", "mortgage", "real estate"],
-                "medical": ["health", "medical", "symptom", "treatment", "disease"],
-                "ai_ml": ["AI", "machine learning", "neural", "algorithm", "model"],
-                "sales": ["sales", "customer", "revenue", "marketing", "lead"],
-                "education": ["learn", "study", "course", "education", "teach"]
-            }
+            # Check all keyword tables in a single pass
+            matches = keyword_matches(query)
+            if not matches:
+                return {
+                    "complexity_score": 0,
+                    "indicators": complexity_indicators,
+                    "domains_mentioned": [],
+                    "requires_multi_agent": False
+                }
             
-            domains_mentioned = []
-            for domain, keywords in domain_keywords.items():
-                if any(keyword.lower() in query.lower() for keyword in keywords):
-                    domains_mentioned.append(domain)
+            # Check for multi-domain indicators
+            domains_mentioned = [
+                domain for domain, _ in DOMAIN_KEYWORDS
+                if ("domain", domain) in matches
+            ]
             
             if len(domains_mentioned) > 1:
                 complexity_indicators["multi_domain"] = True
             
             # Check for comparison keywords
-            comparison_words = ["compare", "versus", "vs", "difference", "better", "choose"]
-            if any(word in query.lower() for word in comparison_words):
+            if ("complexity", "comparison") in matches:
                 complexity_indicators["comparison"] = True
             
             # Check for technical depth
-            technical_words = ["implement", "architecture", "optimize", "integrate", "develop"]
-            if any(word in query.lower() for word in technical_words):
+            if ("complexity", "technical") in matches:
                 complexity_indicators["technical_depth"] = True
             
             # Calculate complexity score
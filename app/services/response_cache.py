@@ -0,0 +1,51 @@
+"""
+Response Cache - Pre-serialized JSON responses for static endpoints
+"""
+import hashlib
+from typing import Any
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+class CachedJSONResponse:
+    """Static JSON payload serialized once and served with an ETag"""
+
+    def __init__(self, payload: Any, max_age: int = 86400):
+        """
+        Serialize payload and compute its ETag
+
+        Args:
+            payload: JSON-serializable response body
+            max_age: Seconds clients may cache the response
+        """
+        self.body = orjson.dumps(payload)
+        self.etag = f'"{hashlib.md5(self.body).hexdigest()}"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}"
+        }
+
+    def _matches(self, if_none_match: str) -> bool:
+        """Check an If-None-Match header against this response's ETag"""
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def respond(self, request: Request) -> Response:
+        """
+        Build the response for a request, honoring If-None-Match
+
+        Args:
+            request: Incoming request
+
+        Returns:
+            304 if the client copy is current, otherwise the cached body
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=self.headers)
+
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
@@ -0,0 +1,193 @@
+"""
+Retrieval Cache - Reuses vector store results for repeated and near-identical queries
+"""
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from app.config import settings
+from app.services.vector_store import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+Results = List[Tuple[Document, float]]
+
+class _QueryMatrix:
+    """Contiguous ring buffer of unit query embeddings with their cached results"""
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors = np.empty((min(64, max_entries), dim), dtype=np.float32)
+        self.entries: List[Tuple[Tuple[Any, ...], Results]] = []
+        self.next = 0
+
+    def add(self, unit: np.ndarray, params: Tuple[Any, ...], results: Results):
+        """Append a row, growing 2x until full and then overwriting the oldest"""
+        size = len(self.entries)
+        if size < self.max_entries:
+            if size == len(self.vectors):
+                grown = np.empty((min(size * 2, self.max_entries), self.vectors.shape[1]), dtype=np.float32)
+                grown[:size] = self.vectors
+                self.vectors = grown
+            self.vectors[size] = unit
+            self.entries.append((params, results))
+        else:
+            self.vectors[self.next] = unit
+            self.entries[self.next] = (params, results)
+            self.next = (self.next + 1) % self.max_entries
+
+    def lookup(self, unit: np.ndarray, params: Tuple[Any, ...], threshold: float) -> Optional[Results]:
+        """Return results of the most similar row above threshold with matching params"""
+        similarities = self.vectors[:len(self.entries)] @ unit
+        candidates = np.flatnonzero(similarities >= threshold)
+        for i in candidates[np.argsort(similarities[candidates])[::-1]]:
+            if self.entries[i][0] == params:
+                return self.entries[i][1]
+        return None
+
+class RetrievalCache:
+    """Exact-match LRU and semantic cache in front of VectorStoreService searches"""
+
+    def __init__(
+        self,
+        vector_store_service: VectorStoreService,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        """
+        Initialize retrieval cache
+
+        Args:
+            vector_store_service: Service searched on a cache miss
+            similarity_threshold: Minimum cosine similarity between queries for a semantic hit
+            max_entries: Maximum number of cached result lists per tier
+        """
+        self.vector_store_service = vector_store_service
+        self.similarity_threshold = similarity_threshold or settings.retrieval_cache_similarity_threshold
+        self.max_entries = max_entries or settings.retrieval_cache_max_entries
+
+        # Exact-match cache: (agent, model, k, threshold, ef_search, store version, query hash) -> results
+        self._exact: "OrderedDict[Tuple[Any, ...], Results]" = OrderedDict()
+
+        # Semantic cache per agent: unit query embeddings plus (params, results) rows
+        self._matrices: Dict[str, _QueryMatrix] = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(agent: str, query: str, params: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """Build the exact-match key, including the embedding model"""
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return (agent, settings.openai_embedding_model) + params + (digest,)
+
+    async def search(
+        self,
+        agent: str,
+        query: str,
+        k: int = 5,
+        threshold: Optional[float] = None,
+        ef_search: Optional[int] = None
+    ) -> Results:
+        """
+        Search an agent's vector store, reusing cached results when possible
+
+        Args:
+            agent: Agent name
+            query: Search query
+            k: Number of results to return
+            threshold: Minimum cosine similarity (default from settings)
+            ef_search: HNSW candidate list size for this query
+
+        Returns:
+            List of (document, score) tuples
+        """
+        if threshold is None:
+            threshold = settings.retrieval_similarity_threshold
+        
+        await self.vector_store_service.wait_until_ready(agent)
+        if agent not in self.vector_store_service.vector_stores:
+            return await asyncio.to_thread(self.vector_store_service.search, agent, query, k=k, threshold=threshold)
+
+        # The store version keeps results from a replaced store from being served
+        params = (k, threshold, ef_search, self.vector_store_service.store_versions.get(agent, 0))
+        key = self._key(agent, query, params)
+        cached = self._exact.get(key)
+        if cached is not None:
+            self._exact.move_to_end(key)
+            self.exact_hits += 1
+            return cached
+
+        embedding = np.asarray(
+            await self.vector_store_service.embeddings.aembed_query(query), dtype=np.float32
+        )
+        norm = np.linalg.norm(embedding)
+        unit = embedding / norm if norm > 0 else embedding
+
+        results = self._semantic_lookup(agent, unit, params)
+        if results is not None:
+            self.semantic_hits += 1
+            self._set_exact(key, results)
+            logger.info("Retrieval cache semantic hit for %s", agent)
+            return results
+
+        self.misses += 1
+        results = await asyncio.to_thread(
+            self.vector_store_service.search_by_vector,
+            agent, embedding.tolist(), k=k, threshold=threshold, ef_search=ef_search
+        )
+
+        self._set_exact(key, results)
+        self._add_vector(agent, unit, params, results)
+        return results
+
+    def _semantic_lookup(self, agent: str, unit: np.ndarray, params: Tuple[Any, ...]) -> Optional[Results]:
+        """Find results for the most similar cached query with the same search parameters"""
+        matrix = self._matrices.get(agent)
+        if matrix is None:
+            return None
+        return matrix.lookup(unit, params, self.similarity_threshold)
+
+    def _set_exact(self, key: Tuple[Any, ...], results: Results):
+        """Insert an exact-match entry, evicting the least recently used when full"""
+        self._exact[key] = results
+        self._exact.move_to_end(key)
+        if len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+
+    def _add_vector(self, agent: str, unit: np.ndarray, params: Tuple[Any, ...], results: Results):
+        """Insert a semantic entry for an agent, overwriting the oldest when full"""
+        matrix = self._matrices.get(agent)
+        if matrix is None:
+            matrix = self._matrices[agent] = _QueryMatrix(len(unit), self.max_entries)
+        matrix.add(unit, params, results)
+
+    def invalidate(self, agent: str):
+        """Drop cached results for an agent whose vector store changed"""
+        for key in [key for key in self._exact if key[0] == agent]:
+            del self._exact[key]
+        self._matrices.pop(agent, None)
+
+    def clear(self):
+        """Remove all cached results"""
+        self._exact.clear()
+        self._matrices.clear()
+        logger.info("Retrieval cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_entries": len(self._exact),
+            "semantic_entries": sum(len(matrix.entries) for matrix in self._matrices.values()),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0
+        }
@@ -0,0 +1,243 @@
+"""
+Route Classifier - Local TF-IDF classifier for routing queries without an LLM call
+"""
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+from app.config import AGENT_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+# Paraphrased training queries per agent, mostly worded without the routing keywords;
+# general includes everyday "explain"/"how do I" questions so those words stay neutral
+ROUTE_EXAMPLES: Dict[str, Tuple[str, ...]] = {
+    "general": (
+        "will it be cold tomorrow",
+        "should I bring an umbrella today",
+        "what is 15 percent of 80",
+        "convert 5 miles to kilometers",
+        "what day is it today",
+        "good morning",
+        "can you help me with something",
+        "tell me a joke",
+        "what's the capital of france",
+        "how many days until christmas",
+        "is it going to snow this weekend",
+        "what is the square root of 144",
+        "explain how a diesel generator works",
+        "explain black holes simply",
+        "how do I judge whether a hotel is any good",
+        "how can I lower my heating costs",
+        "how does a refrigerator keep food cold",
+        "explain why the sky is blue",
+        "how do I fix a leaking faucet",
+        "what is the best way to cook rice",
+        "how do airplanes stay in the air",
+        "recommend a good book to read",
+        "how do I change a flat tire",
+        "who wrote romeo and juliet",
+        "how can I save money on groceries",
+        "what should I pack for a beach trip",
+        "explain how the stock market works",
+        "how do I get rid of ants in the kitchen",
+        "what's a good name for a puppy",
+        "how far is the moon from earth",
+        "translate thank you into spanish",
+        "how do I plan a birthday party",
+        "explain the rules of cricket",
+        "how do solar panels generate electricity",
+        "what time does the sun set today",
+        "how do I remove a coffee stain",
+    ),
+    "medical": (
+        "I have a fever and a sore throat",
+        "my head hurts after running",
+        "what are the side effects of ibuprofen",
+        "is this rash something to worry about",
+        "how much sleep do adults need",
+        "what causes high blood pressure",
+        "can I take aspirin with antibiotics",
+        "how do I lower my cholesterol",
+        "I keep coughing at night",
+        "what vaccines do infants get",
+        "signs of a heart attack",
+        "is it normal to feel dizzy when standing up",
+        "explain how insulin regulates blood sugar",
+        "how do I know if a cut is infected",
+        "what is a normal resting heart rate",
+        "my stomach hurts after eating dairy",
+        "how long does the flu last",
+        "can anxiety cause chest tightness",
+        "what foods help with iron deficiency",
+        "how often should I get a checkup",
+        "is it safe to exercise while pregnant",
+        "how do I treat a sprained ankle",
+        "what are early signs of diabetes",
+        "my child has an ear infection",
+    ),
+    "ai_ml": (
+        "how do transformers work in language models",
+        "explain gradient descent",
+        "what is a large language model",
+        "how do I fine tune gpt on my data",
+        "difference between supervised and unsupervised learning",
+        "what is overfitting and how do I prevent it",
+        "how does backpropagation compute gradients",
+        "which embedding should I use for semantic search",
+        "explain convolutional layers",
+        "how do recommendation systems rank items",
+        "what is reinforcement learning",
+        "how do I evaluate a classifier's precision and recall",
+        "what is a loss function",
+        "how does attention work in transformers",
+        "what is the difference between bert and gpt",
+        "how many epochs should I train for",
+        "explain random forests",
+        "how do I handle class imbalance",
+        "what is retrieval augmented generation",
+        "how do I choose a learning rate",
+        "what are embeddings in nlp",
+        "how does a gan generate images",
+        "what is cross validation",
+        "explain the bias variance tradeoff",
+    ),
+    "real_estate": (
+        "is now a good time to invest in condos",
+        "how much down payment do I need",
+        "what should I check before signing a lease",
+        "how are closing costs calculated",
+        "my landlord won't return my deposit",
+        "what increases a home's resale value",
+        "should I refinance my loan",
+        "how do property taxes work",
+        "tips for first time homebuyers",
+        "what is an escrow account",
+        "how do I find a good neighborhood to live in",
+        "is renting cheaper than owning",
+        "how do I evaluate a rental property investment",
+        "what does a home inspection cover",
+        "how do I price my home for sale",
+        "explain how a fixed rate loan works for a home",
+        "what is a hoa fee",
+        "should I use a realtor to sell",
+        "how do I calculate rental yield",
+        "what is a cap rate on a building",
+        "can my landlord raise the lease price",
+        "how long does closing on a home take",
+        "what are the best cities to buy a condo",
+        "how do I flip a home for profit",
+    ),
+    "sales": (
+        "how do I close more deals this quarter",
+        "tips for cold calling",
+        "how do I handle price objections",
+        "write a follow up email to a prospect",
+        "how do I grow monthly recurring income",
+        "best way to qualify inbound interest",
+        "how should I structure a commission plan",
+        "how do I upsell existing accounts",
+        "what makes a good sales pitch",
+        "how can I reduce churn for my subscription business",
+        "negotiation tactics for enterprise buyers",
+        "how do I forecast bookings",
+        "how do I book more demos",
+        "what should a discovery call cover",
+        "how do I get past a gatekeeper",
+        "tips for writing a cold outreach email",
+        "how do I build a sales team",
+        "how many touches before a buyer responds",
+        "how do I set targets for account executives",
+        "what is a good win rate for b2b",
+        "how do I shorten the sales cycle",
+        "how do I ask for referrals from buyers",
+        "how should I price a saas product",
+        "how do I run a quarterly business review with accounts",
+    ),
+    "education": (
+        "how can I memorize vocabulary faster",
+        "best way to prepare for the sat",
+        "what should I major in",
+        "how do I help my kid with reading",
+        "explain the pythagorean theorem to a child",
+        "good online resources for calculus",
+        "how do I write a college admissions essay",
+        "tips for staying focused while revising",
+        "how do I become a better tutor",
+        "what is spaced repetition",
+        "how do I apply for scholarships",
+        "lesson plan ideas for high school history",
+        "how do I improve my grades",
+        "what are good study habits for college",
+        "how do I prepare for a spelling bee",
+        "how can teachers keep a classroom engaged",
+        "should I do a masters or a phd",
+        "how do I learn a new language quickly",
+        "what are the best note taking methods",
+        "how do I motivate students who fall behind",
+        "how do I write a thesis statement",
+        "tips for passing the bar exam",
+        "how should homeschooling be structured",
+        "how do I get into a top college",
+    ),
+}
+
+class RouteClassifier:
+    """TF-IDF and logistic regression classifier over agent names"""
+
+    def __init__(self, keyword_routes: Sequence[Tuple[str, Sequence[str]]] = ()):
+        """
+        Train the classifier in-process
+
+        Args:
+            keyword_routes: (agent, keywords) routing table, added as extra training text
+        """
+        texts, labels = self._training_data(keyword_routes)
+        # Word features skip stop words so "how"/"explain" carry no domain signal;
+        # character n-grams let related word forms ("diabetes"/"diabetic") share evidence
+        self.pipeline = Pipeline([
+            ("features", FeatureUnion([
+                ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, stop_words="english")),
+                ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True))
+            ])),
+            ("clf", LogisticRegression(C=3.0, max_iter=1000))
+        ])
+        self.pipeline.fit(texts, labels)
+        logger.info(f"Route classifier trained on {len(texts)} examples")
+
+    @staticmethod
+    def _training_data(keyword_routes: Sequence[Tuple[str, Sequence[str]]]) -> Tuple[List[str], List[str]]:
+        """Collect labeled texts from examples, agent descriptions and keywords"""
+        texts: List[str] = []
+        labels: List[str] = []
+
+        for agent, examples in ROUTE_EXAMPLES.items():
+            texts.extend(examples)
+            labels.extend([agent] * len(examples))
+
+        for agent, config in AGENT_CONFIGS.items():
+            texts.append(config["description"])
+            labels.append(agent)
+
+        for agent, keywords in keyword_routes:
+            texts.extend(keywords)
+            labels.extend([agent] * len(keywords))
+
+        return texts, labels
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """
+        Classify a query
+
+        Args:
+            query: User query
+
+        Returns:
+            (agent name, probability) of the most likely agent
+        """
+        probabilities = self.pipeline.predict_proba([query])[0]
+        best = probabilities.argmax()
+        return self.pipeline.classes_[best], float(probabilities[best])
@@ -0,0 +1,185 @@
+"""
+Routing Cache - Reuses orchestrator routing decisions for repeated and similar queries
+"""
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_openai import OpenAIEmbeddings
+
+from app.config import settings
+from app.services.orchestrator import OrchestratorAgent
+
+logger = logging.getLogger(__name__)
+
+class RoutingCache:
+    """Exact-match and semantic cache in front of OrchestratorAgent LLM routing"""
+
+    def __init__(
+        self,
+        orchestrator: OrchestratorAgent,
+        similarity_threshold: Optional[float] = None,
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        """
+        Initialize routing cache
+
+        Args:
+            orchestrator: Orchestrator used to route queries on a cache miss
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            ttl: Seconds before a cached routing decision expires
+            max_entries: Maximum number of cached routing decisions
+        """
+        self.orchestrator = orchestrator
+        self.embeddings = OpenAIEmbeddings(
+            openai_api_key=settings.openai_api_key,
+            model=settings.openai_embedding_model
+        )
+        self.similarity_threshold = similarity_threshold or settings.routing_cache_similarity_threshold
+        self.ttl = ttl or settings.cache_ttl
+        self.max_entries = max_entries or settings.routing_cache_max_entries
+
+        # Exact-match cache: normalized query -> (agent, expires_at)
+        self._exact: Dict[str, Tuple[str, float]] = {}
+
+        # Semantic cache: contiguous ring buffer of unit-normalized embedding rows
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.empty(0, dtype=np.float64)
+        self._agents: List[str] = []
+        self._next = 0
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Lowercase and collapse whitespace in a query"""
+        return " ".join(query.lower().split())
+
+    async def route_query(self, query: str) -> str:
+        """
+        Route a query, reusing a cached decision when possible
+
+        Args:
+            query: User query to route
+
+        Returns:
+            Name of the selected agent
+        """
+        # Keyword and classifier routing are cheaper than an embedding call, so skip the cache
+        keyword_agent = self.orchestrator.keyword_route(query)
+        if keyword_agent:
+            return keyword_agent
+
+        classifier_agent = self.orchestrator.classifier_route(query)
+        if classifier_agent:
+            return classifier_agent
+
+        key = self.normalize(query)
+        now = time.time()
+
+        cached = self._exact.get(key)
+        if cached and cached[1] > now:
+            self.exact_hits += 1
+            logger.info("Routing cache exact hit: %s", cached[0])
+            return cached[0]
+
+        embedding = None
+        try:
+            embedding = await self._embed(key)
+            agent = self._semantic_lookup(embedding, now)
+            if agent:
+                self.semantic_hits += 1
+                self._set_exact(key, agent, now)
+                logger.info("Routing cache semantic hit: %s", agent)
+                return agent
+        except Exception as e:
+            logger.error(f"Error in routing cache lookup: {str(e)}")
+
+        self.misses += 1
+        agent = await self.orchestrator.resolve_route(query)
+        if agent is None:
+            # Don't cache the fallback, so one failed LLM call doesn't misroute until expiry
+            return "general"
+
+        self._set_exact(key, agent, now)
+        if embedding is not None:
+            self._add_vector(embedding, agent, now)
+
+        return agent
+
+    async def _embed(self, text: str) -> np.ndarray:
+        """Embed text as a unit-normalized vector"""
+        vector = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _semantic_lookup(self, embedding: np.ndarray, now: float) -> Optional[str]:
+        """Find the most similar unexpired entry above the similarity threshold"""
+        size = len(self._agents)
+        if not size:
+            return None
+
+        similarities = self._vectors[:size] @ embedding
+        similarities[self._expires[:size] <= now] = -1.0
+
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return self._agents[best]
+        return None
+
+    def _set_exact(self, key: str, agent: str, now: float):
+        """Insert an exact-match entry, evicting the oldest when full"""
+        self._exact.pop(key, None)
+        if len(self._exact) >= self.max_entries:
+            self._exact.pop(next(iter(self._exact)))
+        self._exact[key] = (agent, now + self.ttl)
+
+    def _add_vector(self, embedding: np.ndarray, agent: str, now: float):
+        """Insert a semantic entry, growing 2x until full and then overwriting the oldest"""
+        size = len(self._agents)
+        if self._vectors is None:
+            self._vectors = np.empty((min(64, self.max_entries), len(embedding)), dtype=np.float32)
+            self._expires = np.empty(len(self._vectors), dtype=np.float64)
+
+        if size < self.max_entries:
+            if size == len(self._vectors):
+                capacity = min(size * 2, self.max_entries)
+                vectors = np.empty((capacity, self._vectors.shape[1]), dtype=np.float32)
+                vectors[:size] = self._vectors
+                expires = np.empty(capacity, dtype=np.float64)
+                expires[:size] = self._expires
+                self._vectors, self._expires = vectors, expires
+            slot = size
+            self._agents.append(agent)
+        else:
+            slot = self._next
+            self._agents[slot] = agent
+            self._next = (slot + 1) % self.max_entries
+
+        self._vectors[slot] = embedding
+        self._expires[slot] = now + self.ttl
+
+    def clear(self):
+        """Remove all cached routing decisions"""
+        self._exact.clear()
+        self._vectors = None
+        self._expires = np.empty(0, dtype=np.float64)
+        self._agents = []
+        self._next = 0
+        logger.info("Routing cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_entries": len(self._exact),
+            "semantic_entries": len(self._agents),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0
+        }
@@ -1,43 +1,93 @@
 """
 Specialized Agents - Domain-specific agents for different knowledge areas
 """
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from cachetools import TTLCache
 from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.memory import ConversationBufferMemory
 from langchain.tools import Tool, StructuredTool
 from langchain.schema import SystemMessage, HumanMessage
 
 from app.config import settings, AGENT_CONFIGS
-from app.services.vector_store import VectorStoreService
-from app.services.tools import WeatherTool, CalculatorTool, TimezoneTool, WebSearchTool
+from app.services.chat_history import TokenCountedChatHistory, get_encoding
+from app.services.vector_store import VectorStoreService, get_vector_store_service
+from app.services.tools import get_tool
 
 logger = logging.getLogger(__name__)
 
+# General-purpose tools, built once and shared by every agent
+WEATHER_TOOL = get_tool("weather")
+CALCULATOR_TOOL = get_tool("calculator")
+TIMEZONE_TOOL = get_tool("timezone")
+WEB_SEARCH_TOOL = get_tool("web_search")
+
+# Chat models shared by all agents, keyed by model and temperature
+_shared_llms: Dict[Tuple[str, float], ChatOpenAI] = {}
+_shared_llms_lock = threading.Lock()
+
+def shared_llm(model: str, temperature: float) -> ChatOpenAI:
+    """Get the chat model shared by all agents with this model and temperature"""
+    key = (model, temperature)
+    llm = _shared_llms.get(key)
+    if llm is None:
+        with _shared_llms_lock:
+            llm = _shared_llms.get(key)
+            if llm is None:
+                llm = _shared_llms[key] = ChatOpenAI(
+                    openai_api_key=settings.openai_api_key,
+                    model=model,
+                    temperature=temperature
+                )
+    return llm
+
 class BaseSpecializedAgent(ABC):
     """Base class for specialized agents"""
     
-    def __init__(self, agent_name: str):
-        """Initialize base specialized agent"""
+    # Tool lists built once per agent class; the domain tools are stateless mocks
+    _tool_cache: Dict[type, List[Tool]] = {}
+    
+    def __init__(
+        self,
+        agent_name: str,
+        llm: Optional[ChatOpenAI] = None,
+        vector_store_service: Optional[VectorStoreService] = None
+    ):
+        """
+        Initialize base specialized agent
+        
+        Args:
+            agent_name: Name of the agent
+            llm: Chat model to use (defaults to the shared model for current settings)
+            vector_store_service: Vector store service (defaults to the shared service)
+        """
         self.agent_name = agent_name
         self.config = AGENT_CONFIGS.get(agent_name, {})
         
         # Initialize LLM
-        self.llm = ChatOpenAI(
-            openai_api_key=settings.openai_api_key,
-            model=settings.openai_model,
-            temperature=settings.temperature
-        )
+        self.llm = llm or shared_llm(settings.openai_model, settings.temperature)
         
         # Initialize vector store service
-        self.vector_store_service = VectorStoreService()
+        self.vector_store_service = vector_store_service or get_vector_store_service()
+        
+        # Retrieved (sources, context) by store version and normalized query hash
+        self._context_cache: TTLCache = TTLCache(
+            maxsize=settings.context_cache_max_entries,
+            ttl=settings.context_cache_ttl
+        )
         
         # Get tools for this agent
-        self.tools = self._get_tools()
+        tools = self._tool_cache.get(type(self))
+        if tools is None:
+            tools = self._tool_cache.setdefault(type(self), self._get_tools())
+        self.tools = tools
         
         # Create agent prompt
         self.prompt = self._create_prompt()
@@ -62,8 +112,13 @@ class BaseSpecializedAgent(ABC):
         ])
     
     def _create_agent(self) -> AgentExecutor:
-        """Create agent executor"""
-        agent = create_openai_functions_agent(
+        """
+        Create agent executor
+        
+        The tools agent lets the model request several tool calls in one step,
+        which AgentExecutor runs concurrently on the async path.
+        """
+        agent = create_openai_tools_agent(
             llm=self.llm,
             tools=self.tools,
             prompt=self.prompt
@@ -72,11 +127,34 @@ class BaseSpecializedAgent(ABC):
         return AgentExecutor(
             agent=agent,
             tools=self.tools,
-            verbose=True,
+            verbose=settings.agent_verbose,
             max_iterations=settings.max_iterations,
             handle_parsing_errors=True
         )
     
+    def _pack_context(self, search_results: List[Tuple[Any, float]]) -> str:
+        """
+        Build the knowledge base context from top results within the token budget
+        
+        Args:
+            search_results: (document, score) tuples, best first
+            
+        Returns:
+            Context block to append to the query
+        """
+        encoding = get_encoding(settings.openai_model)
+        remaining = settings.context_token_budget
+        snippets = []
+        
+        for doc, _ in search_results:
+            if remaining <= 0:
+                break
+            tokens = encoding.encode(doc.page_content)[:remaining]
+            snippets.append(encoding.decode(tokens))
+            remaining -= len(tokens)
+        
+        return "\n\nRelevant information from knowledge base:\n\n- " + "\n- ".join(snippets)
+    
     async def process_query(
         self,
         query: str,
@@ -95,37 +173,59 @@ class BaseSpecializedAgent(ABC):
             Agent response with metadata
         """
         try:
-            # Retrieve relevant documents
+            # Retrieve relevant documents, reusing context for repeated queries
             sources = []
             context = ""
             
+            search_task = None
+            cache_key = None
             if include_sources:
-                search_results = self.vector_store_service.search(
-                    agent=self.agent_name,
-                    query=query,
-                    k=5
+                normalized = " ".join(query.lower().split())
+                cache_key = (
+                    self.vector_store_service.store_versions.get(self.agent_name, 0),
+                    hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
                 )
+                cached = self._context_cache.get(cache_key)
+                if cached:
+                    sources, context = cached
+                else:
+                    # Start retrieval first so it overlaps with the remaining setup
+                    search_task = asyncio.create_task(self.vector_store_service.asearch(
+                        agent=self.agent_name,
+                        query=query,
+                        k=5
+                    ))
+            
+            # Get chat history if memory provided, trimmed to the token budget
+            chat_history = []
+            if memory:
+                if isinstance(memory.chat_memory, TokenCountedChatHistory):
+                    chat_history = memory.chat_memory.messages_within(settings.history_token_budget)
+                else:
+                    chat_history = memory.chat_memory.messages
+            
+            if search_task:
+                search_results = await search_task
                 
                 if search_results:
-                    context = "\n\nRelevant information from knowledge base:\n"
-                    for doc, score in search_results:
-                        context += f"\n- {doc.page_content[:500]}..."
-                        sources.append({
+                    context = self._pack_context(search_results)
+                    sources = [
+                        {
                             "content": doc.page_content[:200],
                             "metadata": doc.metadata,
                             "score": float(score)
-                        })
+                        }
+                        for doc, score in search_results
+                    ]
+                    
+                    # Empty results are not cached: asearch also returns [] on errors
+                    self._context_cache[cache_key] = (sources, context)
             
             # Prepare input with context
             enhanced_query = query
             if context:
                 enhanced_query = f"{query}\n{context}"
             
-            # Get chat history if memory provided
-            chat_history = []
-            if memory:
-                chat_history = memory.chat_memory.messages
-            
             # Process with agent
             response = await self.agent.ainvoke({
                 "input": enhanced_query,
@@ -151,26 +251,26 @@ class BaseSpecializedAgent(ABC):
 class GeneralAgent(BaseSpecializedAgent):
     """Agent for general queries, weather, calculations, etc."""
     
-    def __init__(self):
-        super().__init__("general")
+    def __init__(self, **kwargs):
+        super().__init__("general", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get general tools"""
         tools = []
         
         # Add all general-purpose tools
-        tools.append(WeatherTool().as_tool())
-        tools.append(CalculatorTool().as_tool())
-        tools.append(TimezoneTool().as_tool())
-        tools.append(WebSearchTool().as_tool())
+        tools.append(WEATHER_TOOL)
+        tools.append(CALCULATOR_TOOL)
+        tools.append(TIMEZONE_TOOL)
+        tools.append(WEB_SEARCH_TOOL)
         
         return tools
 
 class RealEstateAgent(BaseSpecializedAgent):
     """Agent specialized in real estate topics"""
     
-    def __init__(self):
-        super().__init__("real_estate")
+    def __init__(self, **kwargs):
+        super().__init__("real_estate", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get real estate specific tools"""
@@ -191,8 +291,8 @@ class RealEstateAgent(BaseSpecializedAgent):
         ))
         
         # Add general tools
-        tools.append(WeatherTool().as_tool())
-        tools.append(CalculatorTool().as_tool())
+        tools.append(WEATHER_TOOL)
+        tools.append(CALCULATOR_TOOL)
         
         return tools
     
@@ -207,8 +307,8 @@ class RealEstateAgent(BaseSpecializedAgent):
 class MedicalAgent(BaseSpecializedAgent):
     """Agent specialized in medical and health topics"""
     
-    def __init__(self):
-        super().__init__("medical")
+    def __init__(self, **kwargs):
+        super().__init__("medical", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get medical specific tools"""
@@ -222,7 +322,7 @@ class MedicalAgent(BaseSpecializedAgent):
         ))
         
         # Add general tools
-        tools.append(CalculatorTool().as_tool())
+        tools.append(CALCULATOR_TOOL)
         
         return tools
     
@@ -233,8 +333,8 @@ class MedicalAgent(BaseSpecializedAgent):
 class AIMLAgent(BaseSpecializedAgent):
     """Agent specialized in AI/ML topics"""
     
-    def __init__(self):
-        super().__init__("ai_ml")
+    def __init__(self, **kwargs):
+        super().__init__("ai_ml", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get AI/ML specific tools"""
@@ -255,7 +355,7 @@ class AIMLAgent(BaseSpecializedAgent):
         ))
         
         # Add general tools
-        tools.append(CalculatorTool().as_tool())
+        tools.append(CALCULATOR_TOOL)
         
         return tools
     
@@ -270,8 +370,8 @@ class AIMLAgent(BaseSpecializedAgent):
 class SalesAgent(BaseSpecializedAgent):
     """Agent specialized in sales and business development"""
     
-    def __init__(self):
-        super().__init__("sales")
+    def __init__(self, **kwargs):
+        super().__init__("sales", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get sales specific tools"""
@@ -292,7 +392,7 @@ class SalesAgent(BaseSpecializedAgent):
         ))
         
         # Add general tools
-        tools.append(CalculatorTool().as_tool())
+        tools.append(CALCULATOR_TOOL)
         
         return tools
     
@@ -307,8 +407,8 @@ class SalesAgent(BaseSpecializedAgent):
 class EducationAgent(BaseSpecializedAgent):
     """Agent specialized in education and learning"""
     
-    def __init__(self):
-        super().__init__("education")
+    def __init__(self, **kwargs):
+        super().__init__("education", **kwargs)
     
     def _get_tools(self) -> List[Tool]:
         """Get education specific tools"""
@@ -329,7 +429,7 @@ class EducationAgent(BaseSpecializedAgent):
         ))
         
         # Add general tools
-        tools.append(CalculatorTool().as_tool())
+        tools.append(CALCULATOR_TOOL)
         
         return tools
     
@@ -344,6 +444,10 @@ class EducationAgent(BaseSpecializedAgent):
 class SpecializedAgentFactory:
     """Factory for creating specialized agents"""
     
+    # Initialized agents shared across factory instances, keyed by name and model config
+    _agent_cache: Dict[Tuple[Any, ...], BaseSpecializedAgent] = {}
+    _cache_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize agent factory"""
         self.agents = {
@@ -354,9 +458,6 @@ class SpecializedAgentFactory:
             "sales": SalesAgent,
             "education": EducationAgent
         }
-        
-        # Cache for initialized agents
-        self._agent_cache = {}
     
     def get_agent(self, agent_name: str) -> BaseSpecializedAgent:
         """
@@ -372,11 +473,35 @@ class SpecializedAgentFactory:
             raise ValueError(f"Unknown agent: {agent_name}")
         
         # Check cache
-        if agent_name not in self._agent_cache:
-            agent_class = self.agents[agent_name]
-            self._agent_cache[agent_name] = agent_class()
-        
-        return self._agent_cache[agent_name]
+        key = (agent_name, settings.openai_model, settings.temperature)
+        agent = self._agent_cache.get(key)
+        if agent is None:
+            # Build outside the lock so different agents can initialize in parallel;
+            # if two threads race on one agent, the first inserted wins
+            agent = self.agents[agent_name](
+                llm=shared_llm(settings.openai_model, settings.temperature),
+                vector_store_service=get_vector_store_service()
+            )
+            with self._cache_lock:
+                agent = self._agent_cache.setdefault(key, agent)
+        
+        return agent
+    
+    async def warmup(self):
+        """Initialize every agent concurrently in worker threads"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(None, self.get_agent, name)
+            for name in self.agents
+        ])
+        logger.info(f"Warmed up {len(self.agents)} specialized agents")
+    
+    @classmethod
+    def clear_cache(cls):
+        """Drop all cached agents so they are rebuilt with current settings"""
+        with cls._cache_lock:
+            cls._agent_cache.clear()
+        logger.info("Cleared specialized agent cache")
     
     def get_available_agents(self) -> List[Dict[str, Any]]:
         """Get list of available agents with descriptions"""
@@ -1,32 +1,226 @@
 """
 Tools Module - Dynamic function calls for agents
 """
-import os
+import ast
+import asyncio
+import time
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+from functools import lru_cache
+from types import CodeType, MappingProxyType
+from zoneinfo import ZoneInfo
+from typing import Awaitable, Callable, Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import requests
 import json
-from math import *
+from math import sqrt, sin, cos, tan, log, log10, exp, pow, pi, e
 
+import httpx
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from langchain.tools import Tool
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.config import settings
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
 logger = logging.getLogger(__name__)
 
+# Shared sync HTTP session so repeated tool calls reuse TCP and TLS connections
+_http_session = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+)
+_http_session.mount("https://", _http_adapter)
+_http_session.mount("http://", _http_adapter)
+
+# Shared async HTTP client so concurrent tool calls reuse pooled connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared async HTTP client, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared async HTTP client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Returned without a network call while the weather API circuit is open
+WEATHER_UNAVAILABLE = "Weather service is temporarily unavailable. Please try again in a minute."
+
 class WeatherTool:
     """Tool for getting weather information"""
     
     def __init__(self):
         """Initialize weather tool"""
-        self.api_key = os.getenv("WEATHER_API_KEY")
-        self.base_url = "http://api.weatherapi.com/v1"
+        self.api_key = settings.weather_api_key
+        self.base_url = settings.weather_api_url
+        
+        # Formatted responses by (endpoint, normalized location, days), and in-flight lookups
+        self._current_cache: TTLCache = TTLCache(
+            maxsize=settings.weather_cache_max_entries, ttl=settings.weather_cache_ttl
+        )
+        self._forecast_cache: TTLCache = TTLCache(
+            maxsize=settings.weather_cache_max_entries, ttl=settings.forecast_cache_ttl
+        )
+        self._cache_lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        
+        # Fails fast while the API is degraded and sizes timeouts from recent latencies
+        self._breaker = CircuitBreaker(
+            "weather API",
+            fail_max=settings.tool_breaker_fail_max,
+            reset_timeout=settings.tool_breaker_reset_timeout
+        )
         
         if not self.api_key:
             logger.warning("WEATHER_API_KEY not set in environment variables")
     
+    @staticmethod
+    def _cache_key(endpoint: str, location: str, days: int = 0) -> Tuple[Any, ...]:
+        """Build the response cache key for a lookup"""
+        return (endpoint, location.strip().lower(), days)
+    
+    def _cache_get(self, cache: TTLCache, key: Tuple[Any, ...]) -> Optional[str]:
+        """Get a cached response, or None if missing or expired"""
+        with self._cache_lock:
+            return cache.get(key)
+    
+    def _cache_set(self, cache: TTLCache, key: Tuple[Any, ...], text: str):
+        """Cache a successful response"""
+        with self._cache_lock:
+            cache[key] = text
+    
+    async def _single_flight(self, key: Tuple[Any, ...], fetch: Callable[[], Awaitable[str]]) -> str:
+        """Share one upstream lookup between concurrent identical calls"""
+        pending = self._pending.get(key)
+        if pending:
+            return await asyncio.shield(pending)
+        
+        pending = asyncio.get_running_loop().create_future()
+        self._pending[key] = pending
+        text = "Error getting weather information. Please try again."
+        try:
+            text = await fetch()
+        finally:
+            del self._pending[key]
+            pending.set_result(text)
+        return text
+    
+    def _current_params(self, location: str) -> Dict[str, Any]:
+        """Build query parameters for the current weather endpoint"""
+        return {
+            "key": self.api_key,
+            "q": location,
+            "aqi": "yes"
+        }
+    
+    def _forecast_params(self, location: str, days: int) -> Dict[str, Any]:
+        """Build query parameters for the forecast endpoint"""
+        return {
+            "key": self.api_key,
+            "q": location,
+            "days": days,
+            "aqi": "yes"
+        }
+    
+    @staticmethod
+    def _format_current(data: Dict[str, Any]) -> str:
+        """Format a current weather API response"""
+        current = data.get("current", {})
+        location_data = data.get("location", {})
+        
+        return f"""Current weather in {location_data.get('name')}, {location_data.get('country')}:
+                • Temperature: {current.get('temp_c')}°C ({current.get('temp_f')}°F)
+                • Feels like: {current.get('feelslike_c')}°C
+                • Condition: {current.get('condition', {}).get('text')}
+                • Humidity: {current.get('humidity')}%
+                • Wind: {current.get('wind_kph')} km/h
+                • UV Index: {current.get('uv')}"""
+    
+    @staticmethod
+    def _format_forecast(data: Dict[str, Any]) -> str:
+        """Format a forecast API response"""
+        location_data = data.get("location", {})
+        forecast_days = data.get("forecast", {}).get("forecastday", [])
+        
+        # Collect the parts and join once instead of growing a string per day
+        parts = [f"Weather Forecast for {location_data.get('name')}, {location_data.get('country')}:\n\n"]
+        
+        for day in forecast_days:
+            date = day.get("date")
+            day_data = day.get("day", {})
+            
+            parts.append(f"""
+                    {date}:
+                    - Max Temp: {day_data.get('maxtemp_c')}°C / Min Temp: {day_data.get('mintemp_c')}°C
+                    - Condition: {day_data.get('condition', {}).get('text')}
+                    - Chance of Rain: {day_data.get('daily_chance_of_rain')}%
+                    - Max Wind: {day_data.get('maxwind_kph')} km/h
+                    """)
+        
+        return "".join(parts)
+    
+    def _get(self, endpoint: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        GET an API endpoint through the circuit breaker
+        
+        Connection errors, timeouts and 5xx responses count as failures.
+        
+        Raises:
+            CircuitOpenError: If the API has been failing and is cooling down
+        """
+        self._breaker.check()
+        started = time.monotonic()
+        try:
+            response = _http_session.get(
+                f"{self.base_url}/{endpoint}", params=params, timeout=self._breaker.timeout
+            )
+        except requests.exceptions.RequestException:
+            self._breaker.record_failure()
+            raise
+        
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success(time.monotonic() - started)
+        return response
+    
+    async def _aget(self, endpoint: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        GET an API endpoint asynchronously through the circuit breaker
+        
+        Raises:
+            CircuitOpenError: If the API has been failing and is cooling down
+        """
+        self._breaker.check()
+        started = time.monotonic()
+        try:
+            response = await get_http_client().get(
+                f"{self.base_url}/{endpoint}", params=params, timeout=self._breaker.timeout
+            )
+        except httpx.TransportError:
+            self._breaker.record_failure()
+            raise
+        
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success(time.monotonic() - started)
+        return response
+    
     def get_weather(self, location: str = "Dhaka") -> str:
         """
         Get current weather for a location
@@ -41,15 +235,13 @@ class WeatherTool:
             if not self.api_key:
                 return "Weather API key not configured. Please set WEATHER_API_KEY in your .env file."
             
-            # Make API request
-            url = f"{self.base_url}/current.json"
-            params = {
-                "key": self.api_key,
-                "q": location,
-                "aqi": "yes"
-            }
+            key = self._cache_key("current", location)
+            cached = self._cache_get(self._current_cache, key)
+            if cached:
+                return cached
             
-            response = requests.get(url, params=params, timeout=10)
+            # Make API request
+            response = self._get("current.json", self._current_params(location))
             
             if response.status_code == 401:
                 return "Invalid Weather API key. Please check your WEATHER_API_KEY in .env file."
@@ -58,29 +250,65 @@ class WeatherTool:
             
             response.raise_for_status()
             
-            data = response.json()
+            response_text = self._format_current(response.json())
+            self._cache_set(self._current_cache, key, response_text)
+            logger.info(f"Successfully retrieved weather for {location}")
+            return response_text
+            
+        except CircuitOpenError:
+            return WEATHER_UNAVAILABLE
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching weather data: {str(e)}")
+            return f"Unable to fetch weather data. Please try again later."
+        except Exception as e:
+            logger.error(f"Unexpected error in get_weather: {str(e)}")
+            return f"Error getting weather information. Please try again."
+    
+    async def aget_weather(self, location: str = "Dhaka") -> str:
+        """
+        Get current weather for a location without blocking the event loop
+        
+        Args:
+            location: City name or coordinates
+            
+        Returns:
+            Weather information as string
+        """
+        if not self.api_key:
+            return "Weather API key not configured. Please set WEATHER_API_KEY in your .env file."
+        
+        key = self._cache_key("current", location)
+        cached = self._cache_get(self._current_cache, key)
+        if cached:
+            return cached
+        
+        return await self._single_flight(key, lambda: self._afetch_weather(location, key))
+    
+    async def _afetch_weather(self, location: str, key: Tuple[Any, ...]) -> str:
+        """Fetch, format and cache current weather"""
+        try:
+            # Make API request on the shared connection pool
+            response = await self._aget("current.json", self._current_params(location))
             
-            # Extract relevant information
-            current = data.get("current", {})
-            location_data = data.get("location", {})
+            if response.status_code == 401:
+                return "Invalid Weather API key. Please check your WEATHER_API_KEY in .env file."
+            elif response.status_code == 400:
+                return f"Location '{location}' not found. Please provide a valid city name."
             
-            # Format response
-            response_text = f"""Current weather in {location_data.get('name')}, {location_data.get('country')}:
-                • Temperature: {current.get('temp_c')}°C ({current.get('temp_f')}°F)
-                • Feels like: {current.get('feelslike_c')}°C
-                • Condition: {current.get('condition', {}).get('text')}
-                • Humidity: {current.get('humidity')}%
-                • Wind: {current.get('wind_kph')} km/h
-                • UV Index: {current.get('uv')}"""
+            response.raise_for_status()
             
+            response_text = self._format_current(response.json())
+            self._cache_set(self._current_cache, key, response_text)
             logger.info(f"Successfully retrieved weather for {location}")
             return response_text
             
-        except requests.exceptions.RequestException as e:
+        except CircuitOpenError:
+            return WEATHER_UNAVAILABLE
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching weather data: {str(e)}")
             return f"Unable to fetch weather data. Please try again later."
         except Exception as e:
-            logger.error(f"Unexpected error in get_weather: {str(e)}")
+            logger.error(f"Unexpected error in _afetch_weather: {str(e)}")
             return f"Error getting weather information. Please try again."
     
     def get_forecast(self, location: str = "Dhaka", days: int = 3) -> str:
@@ -101,41 +329,64 @@ class WeatherTool:
             # Limit days to API maximum
             days = min(days, 10)
             
-            # Make API request
-            url = f"{self.base_url}/forecast.json"
-            params = {
-                "key": self.api_key,
-                "q": location,
-                "days": days,
-                "aqi": "yes"
-            }
+            key = self._cache_key("forecast", location, days)
+            cached = self._cache_get(self._forecast_cache, key)
+            if cached:
+                return cached
             
-            response = requests.get(url, params=params, timeout=10)
+            # Make API request
+            response = self._get("forecast.json", self._forecast_params(location, days))
             response.raise_for_status()
             
-            data = response.json()
-            
-            # Extract forecast information
-            location_data = data.get("location", {})
-            forecast_days = data.get("forecast", {}).get("forecastday", [])
+            forecast_text = self._format_forecast(response.json())
+            self._cache_set(self._forecast_cache, key, forecast_text)
+            logger.info(f"Successfully retrieved {days}-day forecast for {location}")
+            return forecast_text
             
-            forecast_text = f"Weather Forecast for {location_data.get('name')}, {location_data.get('country')}:\n\n"
+        except CircuitOpenError:
+            return WEATHER_UNAVAILABLE
+        except Exception as e:
+            logger.error(f"Error getting forecast: {str(e)}")
+            return f"Error getting weather forecast: {str(e)}"
+    
+    async def aget_forecast(self, location: str = "Dhaka", days: int = 3) -> str:
+        """
+        Get weather forecast for a location without blocking the event loop
+        
+        Args:
+            location: City name or coordinates
+            days: Number of days (1-10)
             
-            for day in forecast_days:
-                date = day.get("date")
-                day_data = day.get("day", {})
-                
-                forecast_text += f"""
-                    {date}:
-                    - Max Temp: {day_data.get('maxtemp_c')}°C / Min Temp: {day_data.get('mintemp_c')}°C
-                    - Condition: {day_data.get('condition', {}).get('text')}
-                    - Chance of Rain: {day_data.get('daily_chance_of_rain')}%
-                    - Max Wind: {day_data.get('maxwind_kph')} km/h
-                    """
+        Returns:
+            Weather forecast as string
+        """
+        if not self.api_key:
+            return "Weather API key not configured."
+        
+        # Limit days to API maximum
+        days = min(days, 10)
+        
+        key = self._cache_key("forecast", location, days)
+        cached = self._cache_get(self._forecast_cache, key)
+        if cached:
+            return cached
+        
+        return await self._single_flight(key, lambda: self._afetch_forecast(location, days, key))
+    
+    async def _afetch_forecast(self, location: str, days: int, key: Tuple[Any, ...]) -> str:
+        """Fetch, format and cache a forecast"""
+        try:
+            # Make API request on the shared connection pool
+            response = await self._aget("forecast.json", self._forecast_params(location, days))
+            response.raise_for_status()
             
+            forecast_text = self._format_forecast(response.json())
+            self._cache_set(self._forecast_cache, key, forecast_text)
             logger.info(f"Successfully retrieved {days}-day forecast for {location}")
             return forecast_text
             
+        except CircuitOpenError:
+            return WEATHER_UNAVAILABLE
         except Exception as e:
             logger.error(f"Error getting forecast: {str(e)}")
             return f"Error getting weather forecast: {str(e)}"
@@ -145,9 +396,52 @@ class WeatherTool:
         return Tool(
             name="weather",
             func=self.get_weather,
+            coroutine=self.aget_weather,
             description="Get current weather information for any location. Input should be a city name."
         )
 
+# Names available to calculator expressions, built once
+SAFE_DICT = MappingProxyType({
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sum": sum, "pow": pow, "sqrt": sqrt,
+    "sin": sin, "cos": cos, "tan": tan,
+    "log": log, "log10": log10, "exp": exp,
+    "pi": pi, "e": e
+})
+
+# Syntax node types allowed in calculator expressions
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.keyword,
+    ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+    ast.operator, ast.unaryop
+)
+
+@lru_cache(maxsize=512)
+def _compile_expression(expression: str) -> CodeType:
+    """
+    Parse, validate and compile a calculator expression
+    
+    Args:
+        expression: Mathematical expression
+        
+    Returns:
+        Compiled code object, cached per expression
+        
+    Raises:
+        ValueError: If the expression uses anything but numbers, operators and SAFE_DICT names
+    """
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in SAFE_DICT:
+            raise ValueError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Name):
+            raise ValueError("Only calls to built-in math functions are allowed")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+    return compile(tree, "<calculator>", "eval")
+
 class CalculatorTool:
     """Tool for mathematical calculations"""
     
@@ -162,17 +456,8 @@ class CalculatorTool:
             Calculation result as string
         """
         try:
-            # Safe evaluation of mathematical expressions
-            safe_dict = {
-                "abs": abs, "round": round, "min": min, "max": max,
-                "sum": sum, "pow": pow, "sqrt": sqrt,
-                "sin": sin, "cos": cos, "tan": tan,
-                "log": log, "log10": log10, "exp": exp,
-                "pi": pi, "e": e
-            }
-            
-            # Evaluate expression
-            result = eval(expression, {"__builtins__": {}}, safe_dict)
+            # Evaluate the validated, cached code object
+            result = eval(_compile_expression(expression), {"__builtins__": {}}, SAFE_DICT)
             
             logger.info(f"Calculated: {expression} = {result}")
             return f"Result: {result}"
@@ -189,6 +474,11 @@ class CalculatorTool:
             description="Perform mathematical calculations. Input should be a valid mathematical expression."
         )
 
+@lru_cache(maxsize=64)
+def get_zone(timezone: str) -> ZoneInfo:
+    """Get a timezone, reusing it across calls"""
+    return ZoneInfo(timezone)
+
 class TimezoneTool:
     """Tool for timezone and time-related operations"""
     
@@ -203,12 +493,8 @@ class TimezoneTool:
             Current time as string
         """
         try:
-            from zoneinfo import ZoneInfo
-            from datetime import datetime
-            
             # Get current time in specified timezone
-            tz = ZoneInfo(timezone)
-            current_time = datetime.now(tz)
+            current_time = datetime.now(get_zone(timezone))
             
             time_str = current_time.strftime("%Y-%m-%d %H:%M:%S %Z")
             
@@ -303,6 +589,11 @@ AVAILABLE_TOOLS = {
     "email": EmailTool
 }
 
+@lru_cache(maxsize=None)
+def _tool_instance(tool_name: str) -> Tool:
+    """Build a registered tool once; later calls share it and its caches"""
+    return AVAILABLE_TOOLS[tool_name]().as_tool()
+
 def get_tool(tool_name: str) -> Optional[Tool]:
     """
     Get a tool by name
@@ -311,16 +602,12 @@ def get_tool(tool_name: str) -> Optional[Tool]:
         tool_name: Name of the tool
         
     Returns:
-        Tool instance or None
+        Shared tool instance or None
     """
     if tool_name in AVAILABLE_TOOLS:
-        tool_class = AVAILABLE_TOOLS[tool_name]
-        return tool_class().as_tool()
+        return _tool_instance(tool_name)
     return None
 
 def get_all_tools() -> List[Tool]:
     """Get all available tools"""
-    tools = []
-    for tool_name, tool_class in AVAILABLE_TOOLS.items():
-        tools.append(tool_class().as_tool())
-    return tools
+    return [_tool_instance(tool_name) for tool_name in AVAILABLE_TOOLS]
@@ -2,31 +2,98 @@
 Vector Store Service - Manages FAISS vector stores for document retrieval
 """
 import os
+import asyncio
 import logging
-import pickle
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Dict, Any, Optional
 from pathlib import Path
 
 import faiss
 import numpy as np
+import orjson
 from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
 
 from app.config import settings
+from app.services.batched_embedder import BatchedEmbedder
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+class _ReadWriteLock:
+    """Lets concurrent searches share an index while in-place mutations run alone"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock shared; waits while a writer holds or waits for it"""
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively"""
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
 class VectorStoreService:
     """Service for managing vector stores"""
     
     def __init__(self):
         """Initialize vector store service"""
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=settings.openai_api_key,
+        self.embeddings = CachedEmbeddings(
+            BatchedEmbedder(OpenAIEmbeddings(
+                openai_api_key=settings.openai_api_key,
+                model=settings.openai_embedding_model,
+                chunk_size=1000,
+                max_retries=3,
+                request_timeout=settings.request_timeout,
+                show_progress_bar=False
+            )),
+            cache=EmbeddingCache(settings.embedding_cache_path),
             model=settings.openai_embedding_model
         )
         self.vector_stores: Dict[str, FAISS] = {}
+        # Bumped whenever an agent's store changes, so callers can key caches on it
+        self.store_versions: Dict[str, int] = {}
+        # In-flight async searches, shared by identical concurrent queries
+        self._pending_searches: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        # Stores being built in the background, awaited by searches for agents with no store yet
+        self._building: Dict[str, asyncio.Future] = {}
+        # Serializes store mutations made from worker threads
+        self._lock = threading.RLock()
+        # FAISS releases the GIL and HNSW cannot add during a search, so in-place adds
+        # exclude searches; rebuilt indexes are swapped in with a single assignment instead
+        self._index_lock = _ReadWriteLock()
         self.vector_store_path = Path(settings.vector_store_path)
         self.vector_store_path.mkdir(exist_ok=True)
         
@@ -34,14 +101,39 @@ class VectorStoreService:
         self._load_existing_stores()
     
     def _load_existing_stores(self):
-        """Load existing vector stores from disk"""
-        for store_file in self.vector_store_path.glob("*.pkl"):
-            agent_name = store_file.stem
-            try:
-                self.vector_stores[agent_name] = self._load_store(agent_name)
-                logger.info(f"Loaded vector store for {agent_name}")
-            except Exception as e:
-                logger.error(f"Error loading vector store for {agent_name}: {str(e)}")
+        """Load existing vector stores from disk, one agent per thread"""
+        # Current stores keep metadata in .json; legacy pickled stores are migrated on load
+        agent_names = list(dict.fromkeys(
+            store_file.stem
+            for pattern in ("*.json", "*.pkl")
+            for store_file in self.vector_store_path.glob(pattern)
+        ))
+        if not agent_names:
+            return
+        
+        # Index reads and HNSW migrations release the GIL, so agents load concurrently
+        with ThreadPoolExecutor(max_workers=min(8, len(agent_names))) as executor:
+            for agent_name, vector_store in zip(agent_names, executor.map(self._load_store, agent_names)):
+                if vector_store is not None:
+                    self.vector_stores[agent_name] = vector_store
+                    logger.info(f"Loaded vector store for {agent_name}")
+    
+    def track_build(self, agent: str, build: asyncio.Future):
+        """
+        Register a background build of an agent's store
+        
+        Args:
+            agent: Agent name
+            build: Task or future that completes when the store is ready
+        """
+        self._building[agent] = build
+        build.add_done_callback(lambda _: self._building.pop(agent, None))
+    
+    async def wait_until_ready(self, agent: str):
+        """Wait for a background build if the agent has no store to serve yet"""
+        build = self._building.get(agent)
+        if build is not None and agent not in self.vector_stores:
+            await asyncio.wait([build])
     
     def create_vector_store(self, agent: str, documents: List[Document]) -> FAISS:
         """
@@ -60,14 +152,21 @@ class VectorStoreService:
                 return None
             
             # Create vector store
-            vector_store = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embeddings
+            texts = [doc.page_content for doc in documents]
+            vectors = self.embeddings.embed_documents(texts)
+            vector_store = self._new_store(vectors)
+            vector_store.add_embeddings(
+                text_embeddings=list(zip(texts, vectors)),
+                metadatas=[doc.metadata for doc in documents]
             )
             
             # Save to memory and disk
-            self.vector_stores[agent] = vector_store
-            self._save_store(agent, vector_store)
+            with self._lock:
+                self.vector_stores[agent] = vector_store
+                self._bump_version(agent)
+                self._maybe_quantize(agent, vector_store)
+                self._maybe_compress(agent, vector_store)
+                self._save_store(agent, vector_store)
             
             logger.info(f"Created vector store for {agent} with {len(documents)} documents")
             return vector_store
@@ -76,13 +175,14 @@ class VectorStoreService:
             logger.error(f"Error creating vector store for {agent}: {str(e)}")
             raise
     
-    def add_documents(self, agent: str, documents: List[Document]) -> int:
+    def add_documents(self, agent: str, documents: List[Document], persist: bool = True) -> int:
         """
         Add documents to existing vector store
         
         Args:
             agent: Agent name
             documents: Documents to add
+            persist: Save the store to disk after adding
             
         Returns:
             Number of documents added
@@ -91,15 +191,27 @@ class VectorStoreService:
             if not documents:
                 return 0
             
-            # Get or create vector store
-            if agent in self.vector_stores:
-                vector_store = self.vector_stores[agent]
-                vector_store.add_documents(documents)
-            else:
-                vector_store = self.create_vector_store(agent, documents)
+            # Embed outside the lock so concurrent callers share embedding batches
+            texts = [doc.page_content for doc in documents]
+            vectors = self.embeddings.embed_documents(texts)
             
-            # Save updated store
-            self._save_store(agent, vector_store)
+            with self._lock:
+                # Get or create vector store
+                vector_store = self.vector_stores.get(agent)
+                if vector_store is None:
+                    vector_store = self._new_store(vectors)
+                    self.vector_stores[agent] = vector_store
+                
+                with self._index_lock.write():
+                    vector_store.add_embeddings(
+                        text_embeddings=list(zip(texts, vectors)),
+                        metadatas=[doc.metadata for doc in documents]
+                    )
+                self._bump_version(agent)
+                
+                # Save updated store
+                if persist:
+                    self.persist(agent)
             
             logger.info(f"Added {len(documents)} documents to {agent} vector store")
             return len(documents)
@@ -108,12 +220,33 @@ class VectorStoreService:
             logger.error(f"Error adding documents to {agent}: {str(e)}")
             raise
     
+    def _bump_version(self, agent: str):
+        """Record that an agent's store changed"""
+        self.store_versions[agent] = self.store_versions.get(agent, 0) + 1
+    
+    def persist(self, agent: str):
+        """
+        Quantize and compress if large enough, and save an agent's vector store to disk
+        
+        Args:
+            agent: Agent name
+        """
+        with self._lock:
+            vector_store = self.vector_stores.get(agent)
+            if vector_store is None:
+                return
+            
+            self._maybe_quantize(agent, vector_store)
+            self._maybe_compress(agent, vector_store)
+            self._save_store(agent, vector_store)
+    
     def search(
         self,
         agent: str,
         query: str,
         k: int = 5,
-        threshold: float = 0.7
+        threshold: Optional[float] = None,
+        ef_search: Optional[int] = None
     ) -> List[Tuple[Document, float]]:
         """
         Search for relevant documents
@@ -122,7 +255,8 @@ class VectorStoreService:
             agent: Agent name
             query: Search query
             k: Number of results to return
-            threshold: Minimum similarity threshold
+            threshold: Minimum cosine similarity (default from settings)
+            ef_search: HNSW candidate list size for this query (default from settings)
             
         Returns:
             List of (document, score) tuples
@@ -132,24 +266,147 @@ class VectorStoreService:
                 logger.warning(f"No vector store found for {agent}")
                 return []
             
-            vector_store = self.vector_stores[agent]
-            
             # Perform similarity search with scores
-            results = vector_store.similarity_search_with_score(query, k=k)
+            embedding = self.embeddings.embed_query(query)
+            return self.search_by_vector(agent, embedding, k=k, threshold=threshold, ef_search=ef_search)
+            
+        except Exception as e:
+            logger.error(f"Error searching in {agent}: {str(e)}")
+            return []
+    
+    async def asearch(
+        self,
+        agent: str,
+        query: str,
+        k: int = 5,
+        threshold: Optional[float] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for relevant documents without blocking the event loop
+        
+        The query is embedded with the async client and the index search runs
+        in a worker thread; identical concurrent searches share one lookup.
+        
+        Args:
+            agent: Agent name
+            query: Search query
+            k: Number of results to return
+            threshold: Minimum cosine similarity (default from settings)
+            
+        Returns:
+            List of (document, score) tuples
+        """
+        await self.wait_until_ready(agent)
+        if agent not in self.vector_stores:
+            logger.warning(f"No vector store found for {agent}")
+            return []
+        
+        if threshold is None:
+            threshold = settings.retrieval_similarity_threshold
+        key = (agent, query, k, threshold)
+        pending = self._pending_searches.get(key)
+        if pending:
+            return await asyncio.shield(pending)
+        
+        pending = asyncio.get_running_loop().create_future()
+        self._pending_searches[key] = pending
+        results: List[Tuple[Document, float]] = []
+        try:
+            embedding = await self.embeddings.aembed_query(query)
+            results = await asyncio.to_thread(self.search_by_vector, agent, embedding, k, threshold)
+        except Exception as e:
+            logger.error(f"Error searching in {agent}: {str(e)}")
+        finally:
+            del self._pending_searches[key]
+            pending.set_result(results)
+        
+        return results
+    
+    def search_by_vector(
+        self,
+        agent: str,
+        embedding: List[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for relevant documents with a precomputed query embedding
+        
+        Args:
+            agent: Agent name
+            embedding: Query embedding
+            k: Number of results to return
+            threshold: Minimum cosine similarity (default from settings)
+            ef_search: HNSW candidate list size for this query (default from settings)
+            
+        Returns:
+            List of (document, score) tuples
+        """
+        try:
+            if agent not in self.vector_stores:
+                logger.warning(f"No vector store found for {agent}")
+                return []
             
-            # Filter by threshold
-            filtered_results = [
-                (doc, score) for doc, score in results
-                if score >= threshold
-            ]
+            if threshold is None:
+                threshold = settings.retrieval_similarity_threshold
             
-            logger.info(f"Found {len(filtered_results)} relevant documents for query in {agent}")
-            return filtered_results
+            with self._index_lock.read():
+                vector_store = self.vector_stores[agent]
+                scores, ids = self._similarity_search(vector_store, embedding, k, ef_search)
+                return self._filter_results(agent, vector_store, scores, ids, threshold)
             
         except Exception as e:
             logger.error(f"Error searching in {agent}: {str(e)}")
             return []
     
+    def _similarity_search(
+        self,
+        vector_store: FAISS,
+        embedding: List[float],
+        k: int,
+        ef_search: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run a raw index search, applying a per-query efSearch to HNSW indexes
+        
+        Returns:
+            (scores, ids) arrays for the single query; ids of -1 mark empty slots
+        """
+        index = vector_store.index
+        query = np.asarray([embedding], dtype=np.float32)
+        if ef_search is None or not isinstance(index, faiss.IndexHNSW):
+            scores, ids = index.search(query, k)
+            return scores[0], ids[0]
+        
+        # Passed per call, so the shared index.hnsw.efSearch is never touched and no lock is needed
+        params = faiss.SearchParametersHNSW(efSearch=max(ef_search, k))
+        scores, ids = index.search(query, k, params=params)
+        return scores[0], ids[0]
+    
+    def _filter_results(
+        self,
+        agent: str,
+        vector_store: FAISS,
+        scores: np.ndarray,
+        ids: np.ndarray,
+        threshold: float
+    ) -> List[Tuple[Document, float]]:
+        """
+        Keep results scoring at or above the similarity threshold
+        
+        Scores are inner products of unit vectors (cosine similarity, higher
+        is better). Only the surviving hits are looked up in the docstore.
+        """
+        mask = (scores >= threshold) & (ids >= 0)
+        filtered_results = [
+            (vector_store.docstore.search(vector_store.index_to_docstore_id[position]), score)
+            for position, score in zip(ids[mask].tolist(), scores[mask].tolist())
+        ]
+        
+        logger.info("Found %d relevant documents for query in %s", len(filtered_results), agent)
+        return filtered_results
+    
     def get_retriever(self, agent: str, **kwargs):
         """
         Get a retriever for an agent's vector store
@@ -195,42 +452,221 @@ class VectorStoreService:
         try:
             if agent in self.vector_stores:
                 del self.vector_stores[agent]
+                self._bump_version(agent)
             
-            # Remove from disk
-            store_file = self.vector_store_path / f"{agent}.pkl"
-            if store_file.exists():
-                store_file.unlink()
-            
-            index_file = self.vector_store_path / f"{agent}.faiss"
-            if index_file.exists():
-                index_file.unlink()
+            # Remove from disk, including any legacy pickle
+            for suffix in (".json", ".pkl", ".faiss"):
+                store_file = self.vector_store_path / f"{agent}{suffix}"
+                if store_file.exists():
+                    store_file.unlink()
             
             logger.info(f"Cleared vector store for {agent}")
             
         except Exception as e:
             logger.error(f"Error clearing store for {agent}: {str(e)}")
     
+    def _new_index(self, vectors: np.ndarray, int8: bool = False) -> faiss.IndexHNSW:
+        """
+        Create an empty HNSW index scoring by inner product (cosine on unit vectors)
+        
+        With int8 the index stores 8-bit scalar-quantized codes, with
+        per-dimension ranges trained on the given vectors; only
+        _maybe_quantize asks for it, once a store has enough vectors to
+        train on. With quantize_fp16 it stores half-precision floats, which
+        needs no training and loses almost no recall.
+        
+        Args:
+            vectors: Initial vectors, used for dimension and quantizer training
+            int8: Build an 8-bit scalar-quantized index trained on vectors
+            
+        Returns:
+            Empty HNSW index
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if int8:
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        elif settings.quantize_fp16:
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        else:
+            index = faiss.IndexHNSWFlat(dim, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = settings.hnsw_ef_construction
+        index.hnsw.efSearch = settings.hnsw_ef_search
+        return index
+    
+    def _new_store(self, vectors: List[List[float]]) -> FAISS:
+        """Create an empty HNSW-backed vector store sized for the given vectors"""
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=self._new_index(vectors),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
+    def _maybe_quantize(self, agent: str, vector_store: FAISS):
+        """
+        Rebuild an HNSW store as int8 once it has quantize_min_vectors vectors
+        
+        The quantizer's per-dimension ranges are trained on every vector in
+        the store, so they do not depend on which batch happened to create
+        it; values outside the trained range would otherwise be clipped.
+        
+        Args:
+            agent: Agent name
+            vector_store: Store to quantize in place
+        """
+        index = vector_store.index
+        if not settings.quantize_int8 or not isinstance(index, faiss.IndexHNSW):
+            return
+        if index.ntotal < settings.quantize_min_vectors:
+            return
+        if isinstance(index, faiss.IndexHNSWSQ) and faiss.downcast_index(index.storage).sq.qtype == faiss.ScalarQuantizer.QT_8bit:
+            return
+        
+        vectors = index.reconstruct_n(0, index.ntotal)
+        sq_index = self._new_index(vectors, int8=True)
+        sq_index.add(vectors)
+        
+        vector_store.index = sq_index
+        logger.info(f"Quantized vector store for {agent} to int8 ({index.ntotal} vectors)")
+    
+    def _maybe_compress(self, agent: str, vector_store: FAISS):
+        """
+        Rebuild a large HNSW store as an IVF-PQ index
+        
+        Product quantization compresses each vector to pq_m bytes but needs
+        enough vectors to train its codebooks, so small stores stay HNSW.
+        Vectors reconstructed from an int8 HNSW store are approximate.
+        
+        Args:
+            agent: Agent name
+            vector_store: Store to compress in place
+        """
+        index = vector_store.index
+        if isinstance(index, faiss.IndexIVF) or index.ntotal < settings.pq_min_vectors:
+            return
+        
+        if index.d % settings.pq_m:
+            logger.warning(f"Cannot product-quantize {agent}: dimension {index.d} not divisible by {settings.pq_m}")
+            return
+        
+        vectors = index.reconstruct_n(0, index.ntotal)
+        
+        quantizer = faiss.IndexFlatIP(index.d)
+        pq_index = faiss.IndexIVFPQ(
+            quantizer,
+            index.d,
+            settings.ivf_nlist,
+            settings.pq_m,
+            settings.pq_nbits,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        pq_index.train(vectors)
+        pq_index.add(vectors)
+        pq_index.nprobe = settings.ivf_nprobe
+        
+        vector_store.index = pq_index
+        logger.info(f"Compressed vector store for {agent} to IVF-PQ ({index.ntotal} vectors)")
+    
+    def _migrate_to_hnsw(self, agent: str, vector_store: FAISS):
+        """Rebuild a legacy flat L2 index as HNSW, keeping vector order"""
+        flat_index = vector_store.index
+        vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+        faiss.normalize_L2(vectors)
+        
+        index = self._new_index(vectors)
+        index.add(vectors)
+        vector_store.index = index
+        self._maybe_quantize(agent, vector_store)
+        
+        self._save_store(agent, vector_store)
+        logger.info(f"Migrated vector store for {agent} to HNSW ({flat_index.ntotal} vectors)")
+    
     def _save_store(self, agent: str, vector_store: FAISS):
-        """Save vector store to disk"""
+        """
+        Save vector store to disk
+        
+        The index is written in FAISS's native binary format and the
+        documents plus id mapping as JSON, each replaced atomically so a
+        crash mid-save never leaves a half-written store.
+        
+        Args:
+            agent: Agent name
+            vector_store: Store to save
+        """
         try:
-            # Save FAISS index
-            vector_store.save_local(
-                folder_path=str(self.vector_store_path),
-                index_name=agent
-            )
+            index_file = self.vector_store_path / f"{agent}.faiss"
+            meta_file = self.vector_store_path / f"{agent}.json"
+            
+            metadata = {
+                "index_to_docstore_id": sorted(vector_store.index_to_docstore_id.items()),
+                "documents": {
+                    doc_id: {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc_id, doc in vector_store.docstore._dict.items()
+                }
+            }
+            
+            tmp_index = index_file.with_suffix(".faiss.tmp")
+            faiss.write_index(vector_store.index, str(tmp_index))
+            tmp_meta = meta_file.with_suffix(".json.tmp")
+            tmp_meta.write_bytes(orjson.dumps(metadata, option=orjson.OPT_SERIALIZE_NUMPY, default=str))
+            os.replace(tmp_index, index_file)
+            os.replace(tmp_meta, meta_file)
+            
+            # The JSON copy supersedes any legacy pickle
+            legacy_file = self.vector_store_path / f"{agent}.pkl"
+            if legacy_file.exists():
+                legacy_file.unlink()
+            
             logger.info(f"Saved vector store for {agent}")
         except Exception as e:
             logger.error(f"Error saving vector store for {agent}: {str(e)}")
     
+    def _read_store(self, agent: str) -> FAISS:
+        """Read a store saved by _save_store"""
+        index = faiss.read_index(str(self.vector_store_path / f"{agent}.faiss"))
+        metadata = orjson.loads((self.vector_store_path / f"{agent}.json").read_bytes())
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore({
+                doc_id: Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                for doc_id, doc in metadata["documents"].items()
+            }),
+            index_to_docstore_id={position: doc_id for position, doc_id in metadata["index_to_docstore_id"]},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
     def _load_store(self, agent: str) -> Optional[FAISS]:
-        """Load vector store from disk"""
+        """Load vector store from disk, migrating legacy pickled stores"""
         try:
-            vector_store = FAISS.load_local(
-                folder_path=str(self.vector_store_path),
-                embeddings=self.embeddings,
-                index_name=agent,
-                allow_dangerous_deserialization=True  
-            )
+            legacy = not (self.vector_store_path / f"{agent}.json").exists()
+            if legacy:
+                vector_store = FAISS.load_local(
+                    folder_path=str(self.vector_store_path),
+                    embeddings=self.embeddings,
+                    index_name=agent,
+                    allow_dangerous_deserialization=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+            else:
+                vector_store = self._read_store(agent)
+            
+            if isinstance(vector_store.index, faiss.IndexIVF):
+                vector_store.index.nprobe = settings.ivf_nprobe
+            elif isinstance(vector_store.index, faiss.IndexHNSW):
+                vector_store.index.hnsw.efSearch = settings.hnsw_ef_search
+            else:
+                # Saves in the current format as part of the migration
+                self._migrate_to_hnsw(agent, vector_store)
+                return vector_store
+            
+            if legacy:
+                self._save_store(agent, vector_store)
             return vector_store
         except Exception as e:
             logger.error(f"Error loading vector store for {agent}: {str(e)}")
@@ -268,3 +704,15 @@ class VectorStoreService:
     def get_all_agents(self) -> List[str]:
         """Get list of all agents with vector stores"""
         return list(self.vector_stores.keys())
+
+_vector_store_service: Optional[VectorStoreService] = None
+_vector_store_service_lock = threading.Lock()
+
+def get_vector_store_service() -> VectorStoreService:
+    """Get the process-wide vector store service, creating it on first use"""
+    global _vector_store_service
+    if _vector_store_service is None:
+        with _vector_store_service_lock:
+            if _vector_store_service is None:
+                _vector_store_service = VectorStoreService()
+    return _vector_store_service
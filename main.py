@@ -2,7 +2,10 @@
 Main application file for Voice-Enabled AI Agent System
 """
 import os
+import queue
+import asyncio
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pathlib import Path
@@ -10,7 +13,7 @@ from pathlib import Path
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 import uvicorn
 from dotenv import load_dotenv
@@ -18,20 +21,36 @@ from dotenv import load_dotenv
 # Import routers
 from app.routers.audio import audio_router
 from app.routers.chat import chat_router
-from app.routers.rag import rag_router
+from app.routers.rag import document_pool, rag_router, worker_log_listener
 from app.services.document_loader import DocumentLoader
-from app.services.vector_store import VectorStoreService
+from app.services.vector_store import get_vector_store_service
+from app.services.metrics_logger import MetricsLogger
+from app.services.response_cache import CachedJSONResponse
+from app.services.specialized_agents import SpecializedAgentFactory
+from app.services.tools import close_http_client
 from app.config import settings
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Create necessary directories, before logging opens logs/app.log; one stat each when they exist
+for directory in ("logs", "dataset", "static", "templates", "vector_stores"):
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+
+# Configure logging; request paths only enqueue records, a listener thread does the writes
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_handlers = [
+    RotatingFileHandler('logs/app.log', maxBytes=10 << 20, backupCount=5),
+    logging.StreamHandler()
+]
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_formatter)
+
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+queue_handler = QueueHandler(log_queue)
+# Leave formatting to the listener's handlers; the queued record only needs its message
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -41,7 +60,8 @@ load_dotenv()
 app = FastAPI(
     title="Voice-Enabled AI Agent System",
     description="Multi-agent RAG system with voice capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -53,13 +73,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create necessary directories
-Path("logs").mkdir(exist_ok=True)
-Path("dataset").mkdir(exist_ok=True)
-Path("static").mkdir(exist_ok=True)
-Path("templates").mkdir(exist_ok=True)
-Path("vector_stores").mkdir(exist_ok=True)
-
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -71,6 +84,30 @@ app.include_router(audio_router)
 app.include_router(chat_router)
 app.include_router(rag_router)
 
+# Static system information, serialized once
+SYSTEM_INFO_RESPONSE = CachedJSONResponse({
+    "agents": [
+        "real_estate",
+        "medical",
+        "ai_ml",
+        "sales",
+        "education"
+    ],
+    "capabilities": {
+        "voice_input": True,
+        "voice_output": True,
+        "document_retrieval": True,
+        "dynamic_functions": ["weather", "time", "calculator"],
+        "multi_agent": True
+    },
+    "models": {
+        "llm": "gpt-4",
+        "embeddings": "text-embedding-3-small",
+        "stt": "whisper-1",
+        "tts": "tts-1"
+    }
+}, max_age=settings.cache_ttl)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
@@ -79,26 +116,48 @@ async def startup_event():
         
         # Initialize document loader and vector stores
         doc_loader = DocumentLoader()
-        vector_service = VectorStoreService()
+        vector_service = get_vector_store_service()
         
-        # Load documents from dataset folder
+        def load_agent_folder(agent_folder: Path):
+            """Load one agent's dataset folder and build its vector store"""
+            agent_name = agent_folder.name
+            try:
+                logger.info(f"Loading documents for {agent_name} agent...")
+                
+                documents = doc_loader.load_documents(str(agent_folder))
+                if documents:
+                    vector_service.create_vector_store(agent_name, documents)
+                    logger.info(f"Created vector store for {agent_name} with {len(documents)} documents")
+            except Exception as e:
+                logger.error(f"Error building vector store for {agent_name}: {str(e)}")
+        
+        # Build each agent's store in the background; searches for an agent wait only on its own build
         dataset_path = Path("dataset")
         if dataset_path.exists():
             for agent_folder in dataset_path.iterdir():
                 if agent_folder.is_dir():
-                    agent_name = agent_folder.name
-                    logger.info(f"Loading documents for {agent_name} agent...")
-                    
-                    documents = doc_loader.load_documents(str(agent_folder))
-                    if documents:
-                        vector_service.create_vector_store(agent_name, documents)
-                        logger.info(f"Created vector store for {agent_name} with {len(documents)} documents")
+                    vector_service.track_build(
+                        agent_folder.name,
+                        asyncio.create_task(asyncio.to_thread(load_agent_folder, agent_folder))
+                    )
+        
+        # Build agents up front so the first query to each one skips initialization
+        await SpecializedAgentFactory().warmup()
         
         logger.info("System initialization complete")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush background work on shutdown"""
+    MetricsLogger().close()
+    await close_http_client()
+    document_pool.shutdown(cancel_futures=True)
+    worker_log_listener.stop()
+    log_listener.stop()
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Serve the main HTML page"""
@@ -114,30 +173,9 @@ async def health_check():
     }
 
 @app.get("/api/system-info")
-async def system_info():
+async def system_info(request: Request):
     """Get system information"""
-    return {
-        "agents": [
-            "real_estate",
-            "medical",
-            "ai_ml",
-            "sales",
-            "education"
-        ],
-        "capabilities": {
-            "voice_input": True,
-            "voice_output": True,
-            "document_retrieval": True,
-            "dynamic_functions": ["weather", "time", "calculator"],
-            "multi_agent": True
-        },
-        "models": {
-            "llm": "gpt-4",
-            "embeddings": "text-embedding-3-small",
-            "stt": "whisper-1",
-            "tts": "tts-1"
-        }
-    }
+    return SYSTEM_INFO_RESPONSE.respond(request)
 
 if __name__ == "__main__":
     uvicorn.run(